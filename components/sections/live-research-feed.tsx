@@ -9,22 +9,34 @@ interface ResearchSource {
   date: string;
 }
 
+// List endpoints are fetched with view=compact: cards get a `teaser` and no summary,
+// sources or key stats until the full record is loaded from /api/research/{id}
 interface ResearchUpdate {
   id: number;
   topic: string;
-  summary: string;
-  sources: ResearchSource[];
-  key_stats: string[];
+  summary?: string;
+  teaser?: string;
+  truncated?: boolean;
+  sources?: ResearchSource[];
+  key_stats?: string[];
   image_url?: string;
+  image_status?: 'none' | 'pending' | 'generating' | 'ready' | 'failed';
+  image_version?: string | null;
   created_at: string;
 }
 
 const RESEARCH_API_URL = process.env.NEXT_PUBLIC_RESEARCH_API_URL || 'https://postlabor-research-agent.onrender.com';
 
 // Helper to get image URL - uses our API endpoint that serves from PostgreSQL
-const getImageUrl = (update: ResearchUpdate) => {
-  // If we have stored image data, use our API endpoint
-  return `${RESEARCH_API_URL}/api/research/${update.id}/image`;
+// `width` picks the smallest pre-generated variant at least that wide (WebP/AVIF when supported);
+// `v` pins the URL to the record's current images, so the browser can cache it for good
+const getImageUrl = (update: ResearchUpdate, width?: number) => {
+  const params = new URLSearchParams();
+  if (width) params.set('w', String(width));
+  if (update.image_version) params.set('v', update.image_version);
+  const query = params.toString();
+  const url = `${RESEARCH_API_URL}/api/research/${update.id}/image`;
+  return query ? `${url}?${query}` : url;
 };
 
 export function LiveResearchFeed() {
@@ -36,7 +48,7 @@ export function LiveResearchFeed() {
 
   const fetchUpdates = async () => {
     try {
-      const res = await fetch(`${RESEARCH_API_URL}/api/research?limit=6`);
+      const res = await fetch(`${RESEARCH_API_URL}/api/research?limit=6&view=compact`);
       if (!res.ok) throw new Error('Failed to fetch');
       const data = await res.json();
       setUpdates(data.updates || []);
@@ -49,7 +61,7 @@ export function LiveResearchFeed() {
 
   const fetchAllUpdates = async () => {
     try {
-      const res = await fetch(`${RESEARCH_API_URL}/api/research/all`);
+      const res = await fetch(`${RESEARCH_API_URL}/api/research/all?view=compact`);
       if (!res.ok) throw new Error('Failed to fetch');
       const data = await res.json();
       setAllUpdates(data.updates || []);
@@ -58,10 +70,39 @@ export function LiveResearchFeed() {
     }
   };
 
+  // Open a card right away, then swap in the full record if the card only has the compact fields
+  const openUpdate = async (update: ResearchUpdate) => {
+    setSelectedUpdate(update);
+    if (update.summary !== undefined) return;
+    try {
+      const res = await fetch(`${RESEARCH_API_URL}/api/research/${update.id}`);
+      if (!res.ok) throw new Error('Failed to fetch');
+      const full: ResearchUpdate = await res.json();
+      setSelectedUpdate(prev => prev && prev.id === full.id ? full : prev);
+    } catch (err) {
+      console.error('Fetch error:', err);
+    }
+  };
+
   useEffect(() => {
     fetchUpdates();
-    const interval = setInterval(fetchUpdates, 60 * 1000); // Check every minute for UI updates
-    return () => clearInterval(interval);
+
+    // New research is pushed over Server-Sent Events; EventSource reconnects and resumes on its own
+    const source = new EventSource(`${RESEARCH_API_URL}/api/research/stream`);
+    source.addEventListener('research', (event) => {
+      const update: ResearchUpdate = JSON.parse((event as MessageEvent).data);
+      setUpdates(prev => [update, ...prev.filter(u => u.id !== update.id)].slice(0, 6));
+      setAllUpdates(prev => prev.length ? [update, ...prev.filter(u => u.id !== update.id)] : prev);
+    });
+    // Images are generated after the text is saved; swap the record in once its image is ready
+    source.addEventListener('image', (event) => {
+      const update: ResearchUpdate = JSON.parse((event as MessageEvent).data);
+      const replace = (prev: ResearchUpdate[]) => prev.map(u => u.id === update.id ? update : u);
+      setUpdates(replace);
+      setAllUpdates(replace);
+      setSelectedUpdate(prev => prev && prev.id === update.id ? update : prev);
+    });
+    return () => source.close();
   }, []);
 
   useEffect(() => {
@@ -123,7 +164,7 @@ export function LiveResearchFeed() {
           /* Archive View */
           <ArchiveView 
             updates={allUpdates} 
-            onSelect={setSelectedUpdate}
+            onSelect={openUpdate}
             onLoadMore={fetchAllUpdates}
           />
         ) : (
@@ -134,12 +175,13 @@ export function LiveResearchFeed() {
               <motion.article
                 initial={{ opacity: 0, y: 20 }}
                 animate={{ opacity: 1, y: 0 }}
-                onClick={() => setSelectedUpdate(featured)}
+                onClick={() => openUpdate(featured)}
                 className="group cursor-pointer"
               >
                 <div className="relative h-[400px] md:h-[500px] rounded-2xl overflow-hidden">
                   <img 
-                    src={getImageUrl(featured)} 
+                    key={`${featured.id}-${featured.image_status}`}
+                    src={getImageUrl(featured, 1792)} 
                     alt="" 
                     className="absolute inset-0 w-full h-full object-cover transition-transform duration-700 group-hover:scale-105"
                     onError={(e) => { e.currentTarget.style.display = 'none'; }}
@@ -151,7 +193,7 @@ export function LiveResearchFeed() {
                       Latest
                     </span>
                     <h3 className="text-2xl md:text-3xl font-light text-white mb-3">{featured.topic}</h3>
-                    <p className="text-white/50 font-light line-clamp-2 max-w-2xl">{featured.summary}</p>
+                    <p className="text-white/50 font-light line-clamp-2 max-w-2xl">{featured.summary ?? featured.teaser}</p>
                   </div>
                 </div>
               </motion.article>
@@ -165,12 +207,13 @@ export function LiveResearchFeed() {
                   initial={{ opacity: 0, y: 20 }}
                   animate={{ opacity: 1, y: 0 }}
                   transition={{ delay: i * 0.1 }}
-                  onClick={() => setSelectedUpdate(update)}
+                  onClick={() => openUpdate(update)}
                   className="group cursor-pointer"
                 >
                   <div className="relative aspect-[4/3] rounded-xl overflow-hidden">
                     <img 
-                      src={getImageUrl(update)} 
+                      key={`${update.id}-${update.image_status}`}
+                      src={getImageUrl(update, 480)} 
                       alt="" 
                       className="absolute inset-0 w-full h-full object-cover transition-transform duration-500 group-hover:scale-105"
                       onError={(e) => { e.currentTarget.style.display = 'none'; }}
@@ -252,7 +295,8 @@ function ArchiveView({
                 >
                   <div className="relative aspect-video rounded-lg overflow-hidden">
                     <img 
-                      src={`${RESEARCH_API_URL}/api/research/${update.id}/image`}
+                      key={`${update.id}-${update.image_status}`}
+                      src={getImageUrl(update, 960)}
                       alt="" 
                       className="absolute inset-0 w-full h-full object-cover opacity-80 group-hover:opacity-100 transition-opacity"
                       onError={(e) => { e.currentTarget.style.display = 'none'; }}
@@ -296,7 +340,8 @@ function DetailModal({ update, onClose }: { update: ResearchUpdate; onClose: ()
       {/* Image Hero */}
       <div className="relative h-[40vh] md:h-[50vh]">
         <img 
-          src={`${RESEARCH_API_URL}/api/research/${update.id}/image`}
+          key={`${update.id}-${update.image_status}`}
+          src={getImageUrl(update, 1792)}
           alt="" 
           className="absolute inset-0 w-full h-full object-cover"
           onError={(e) => { e.currentTarget.style.display = 'none'; }}
@@ -323,9 +368,11 @@ function DetailModal({ update, onClose }: { update: ResearchUpdate; onClose: ()
       {/* Content */}
       <div onClick={(e) => e.stopPropagation()} className="bg-black">
         <div className="max-w-3xl mx-auto px-6 md:px-12 py-10 space-y-10">
-          <p className="text-lg text-white/60 font-light leading-relaxed">{update.summary}</p>
+          <p className="text-lg text-white/60 font-light leading-relaxed">
+            {update.summary ?? `${update.teaser ?? ''}${update.truncated ? '…' : ''}`}
+          </p>
 
-          {update.key_stats?.length > 0 && (
+          {update.key_stats && update.key_stats.length > 0 && (
             <div>
               <h3 className="text-xs tracking-[0.2em] uppercase text-white/30 mb-4">Key Statistics</h3>
               <div className="space-y-3">
@@ -339,7 +386,7 @@ function DetailModal({ update, onClose }: { update: ResearchUpdate; onClose: ()
             </div>
           )}
 
-          {update.sources?.length > 0 && (
+          {update.sources && update.sources.length > 0 && (
             <div>
               <h3 className="text-xs tracking-[0.2em] uppercase text-white/30 mb-4">Sources</h3>
               <div className="space-y-2">
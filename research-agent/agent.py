@@ -1,11 +1,18 @@
 import os
 import json
+import time
 import random
-import hashlib
-import httpx
-import base64
+import asyncio
 from datetime import datetime
-from database import save_research, topic_exists_recently, get_similar_research, get_all_topics, get_latest_research
+import freshness
+import llm_cache
+import search_cache
+import upstream
+import image_queue
+from database import save_research, save_research_batch, topic_exists_recently, get_similar_research, \
+    find_known_sources, get_image_data, save_image_variants, get_ids_missing_variants, attach_image, \
+    get_cached_completion, store_cached_completion, prune_llm_cache
+from images import build_variants, image_width, forget_etags
 
 # API Keys
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
@@ -46,55 +53,111 @@ TOPIC_POOL = [
     "meaning purpose work AI age",
 ]
 
+# Chat model used for summaries and image prompts
+OPENAI_MODEL = "gpt-4o-mini"
+OPENAI_TEMPERATURE = 0.7
+
+# Tavily search depth ("basic" or "advanced")
+SEARCH_DEPTH = "basic"
+
 # Cache settings
 CACHE_HOURS = 6  # Don't re-research same topic within 6 hours
 
-def call_openai(messages: list, max_tokens: int = 1000) -> str:
-    """Call OpenAI Chat API"""
+# Batch news sweep: all NEWS_QUERIES searched together and clustered into stories
+NEWS_SWEEP_MAX_STORIES = int(os.environ.get("NEWS_SWEEP_MAX_STORIES", "3"))
+# Results a story needs to be written up; coverage often fails to cluster, so one is enough
+NEWS_SWEEP_MIN_SOURCES = int(os.environ.get("NEWS_SWEEP_MIN_SOURCES", "1"))
+
+# How many topics run_all_research works on at once
+RESEARCH_CONCURRENCY = int(os.environ.get("RESEARCH_CONCURRENCY", "3"))
+
+async def timed(timings: dict, stage: str, awaitable):
+    """Await something and record its wall-clock duration (seconds) under timings[stage]"""
+    start = time.perf_counter()
     try:
-        with httpx.Client(timeout=60.0) as client:
-            response = client.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers={
-                    "Authorization": f"Bearer {OPENAI_API_KEY}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "model": "gpt-4o-mini",
-                    "messages": messages,
-                    "temperature": 0.7,
-                    "max_tokens": max_tokens
-                }
-            )
-            response.raise_for_status()
-            return response.json()["choices"][0]["message"]["content"]
+        return await awaitable
+    finally:
+        timings[stage] = round(time.perf_counter() - start, 3)
+
+def report(progress, stage: str, **details):
+    """Forward a pipeline stage to an optional progress callback (used by background jobs)"""
+    if progress:
+        progress(stage, **details)
+
+async def call_openai(messages: list, max_tokens: int = 1000, use_cache: bool = True) -> str:
+    """Call OpenAI Chat API
+
+    Identical requests are answered from the llm_cache table for LLM_CACHE_TTL_HOURS;
+    `use_cache=False` skips the lookup (the fresh answer is still stored).
+    """
+    key = llm_cache.cache_key(OPENAI_MODEL, messages, OPENAI_TEMPERATURE, max_tokens)
+    if use_cache:
+        try:
+            cached = await get_cached_completion(key, llm_cache.LLM_CACHE_TTL_HOURS)
+        except Exception as e:
+            print(f"LLM cache lookup error: {e}")
+            cached = None
+        if cached:
+            llm_cache.record_hit(cached[1])
+            return cached[0]
+        llm_cache.stats["misses"] += 1
+    else:
+        llm_cache.stats["bypassed"] += 1
+    
+    try:
+        response = await upstream.request(
+            "openai", "POST", "https://api.openai.com/v1/chat/completions",
+            headers={
+                "Authorization": f"Bearer {OPENAI_API_KEY}",
+                "Content-Type": "application/json"
+            },
+            json={
+                "model": OPENAI_MODEL,
+                "messages": messages,
+                "temperature": OPENAI_TEMPERATURE,
+                "max_tokens": max_tokens
+            },
+            timeout=60.0
+        )
+        body = response.json()
+        content = body["choices"][0]["message"]["content"]
     except Exception as e:
         print(f"OpenAI API error: {e}")
         return ""
+    
+    if content:
+        try:
+            await store_cached_completion(key, OPENAI_MODEL, content, body.get("usage", {}).get("total_tokens", 0))
+            if llm_cache.record_store():
+                await prune_llm_cache(llm_cache.LLM_CACHE_TTL_HOURS, llm_cache.LLM_CACHE_MAX_ENTRIES)
+        except Exception as e:
+            print(f"LLM cache store error: {e}")
+    return content
 
-def download_image_as_base64(image_url: str) -> str:
-    """Download image from URL and return as base64 string"""
+async def download_image(image_url: str) -> bytes:
+    """Download image from URL and return its raw bytes"""
     try:
-        with httpx.Client(timeout=60.0) as client:
-            response = client.get(image_url)
-            response.raise_for_status()
-            image_data = response.content
-            return base64.b64encode(image_data).decode('utf-8')
+        response = await upstream.request("download", "GET", image_url, timeout=60.0)
+        return response.content
     except Exception as e:
         print(f"Error downloading image: {e}")
         return None
 
-def generate_image(topic: str, summary: str) -> tuple[str, str, str]:
-    """Generate an image using DALL-E 3 and return base64 data for storage"""
+async def generate_image(topic: str, summary: str = "", timings: dict = None, use_cache: bool = True) -> tuple[bytes, str]:
+    """Generate an image using DALL-E 3 and return its bytes for storage
+
+    The prompt is derived from the topic alone, so this can run alongside summarization.
+    """
+    timings = timings if timings is not None else {}
     prompt_request = f"""Create a DALL-E prompt (max 150 chars) for: "{topic}"
 Style: Abstract, cinematic, futuristic. Dark moody with ethereal glowing elements.
 NO text/words/letters. Focus on mood, not literal.
 Return ONLY the prompt."""
 
-    image_prompt = call_openai([
+    image_prompt = await timed(timings, "image_prompt", call_openai([
         {"role": "system", "content": "Create evocative DALL-E prompts. Return only the prompt."},
         {"role": "user", "content": prompt_request}
-    ], max_tokens=80)
+    ], max_tokens=80, use_cache=use_cache))
     
     if not image_prompt:
         image_prompt = "Abstract futuristic digital art, dark atmosphere, glowing cyan purple accents, volumetric lighting, cinematic, no text"
@@ -102,78 +165,116 @@ Return ONLY the prompt."""
     image_prompt = image_prompt.strip().strip('"\'')[:400]
     
     try:
-        with httpx.Client(timeout=120.0) as client:
-            response = client.post(
-                "https://api.openai.com/v1/images/generations",
-                headers={"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"},
-                json={"model": "dall-e-3", "prompt": image_prompt, "n": 1, "size": "1792x1024", "quality": "standard", "style": "vivid"}
-            )
-            response.raise_for_status()
-            data = response.json()
-            temp_url = data["data"][0]["url"]
-            revised_prompt = data["data"][0].get("revised_prompt", image_prompt)
-            
-            # Download and convert to base64 for permanent storage in PostgreSQL
-            image_base64 = download_image_as_base64(temp_url)
-            if image_base64:
-                print(f"  ✓ Image downloaded and converted to base64 ({len(image_base64) // 1024}KB)")
-            
-            return image_base64, revised_prompt
+        response = await timed(timings, "image_generation", upstream.request(
+            "openai_images", "POST", "https://api.openai.com/v1/images/generations",
+            headers={"Authorization": f"Bearer {OPENAI_API_KEY}", "Content-Type": "application/json"},
+            json={"model": "dall-e-3", "prompt": image_prompt, "n": 1, "size": "1792x1024", "quality": "standard", "style": "vivid"},
+            timeout=120.0
+        ))
+        data = response.json()
+        temp_url = data["data"][0]["url"]
+        revised_prompt = data["data"][0].get("revised_prompt", image_prompt)
+        
+        # Download for permanent storage in PostgreSQL (DALL-E URLs expire)
+        image_bytes = await timed(timings, "image_download", download_image(temp_url))
+        if image_bytes:
+            print(f"  ✓ Image downloaded ({len(image_bytes) // 1024}KB)")
+        
+        return image_bytes, revised_prompt
     except Exception as e:
         print(f"DALL-E error: {e}")
         return None, image_prompt
 
-def search_news(query: str, max_results: int = 5) -> list:
-    """Search for recent news using Tavily with freshness focus"""
+async def create_image_variants(image_data: bytes) -> list:
+    """Build resized WebP/AVIF variants of a downloaded image off the event loop"""
+    if not image_data:
+        return []
     try:
-        with httpx.Client(timeout=30.0) as client:
-            response = client.post(
-                "https://api.tavily.com/search",
-                headers={"Content-Type": "application/json"},
-                json={
-                    "api_key": TAVILY_API_KEY,
-                    "query": query,
-                    "max_results": max_results,
-                    "search_depth": "basic",
-                    "include_domains": [],  # All domains
-                    "exclude_domains": []
-                }
-            )
-            response.raise_for_status()
-            return response.json().get("results", [])
+        variants = await asyncio.to_thread(build_variants, image_data)
+        total = sum(len(v["data"]) for v in variants)
+        print(f"  ✓ Built {len(variants)} image variants ({total // 1024}KB total)")
+        return variants
+    except Exception as e:
+        print(f"Image variant error: {e}")
+        return []
+
+async def fetch_search_results(query: str, max_results: int = 5) -> list:
+    """Search for recent news using Tavily (raises on failure)"""
+    response = await upstream.request(
+        "tavily", "POST", "https://api.tavily.com/search",
+        headers={"Content-Type": "application/json"},
+        json={
+            "api_key": TAVILY_API_KEY,
+            "query": query,
+            "max_results": max_results,
+            "search_depth": SEARCH_DEPTH,
+            "include_domains": [],  # All domains
+            "exclude_domains": []
+        },
+        timeout=30.0
+    )
+    return response.json().get("results", [])
+
+async def search_news(query: str, max_results: int = 5) -> list:
+    """Search for recent news using Tavily with freshness focus
+
+    Results are cached for SEARCH_CACHE_TTL and identical concurrent searches share
+    one request. If Tavily fails, the last results for the query are used instead.
+    """
+    key = (query, max_results, SEARCH_DEPTH)
+    try:
+        return await search_cache.get_or_fetch(key, lambda: fetch_search_results(query, max_results))
     except Exception as e:
         print(f"Tavily error: {e}")
+        results = search_cache.stale(key)
+        if results is not None:
+            print(f"  Using cached results for '{query}'")
+            return results
         return []
 
-def is_content_fresh(search_results: list, existing_research: list) -> bool:
-    """Check if search results contain genuinely new content"""
-    if not search_results:
-        return False
-    
-    # Get URLs from existing research
-    existing_urls = set()
-    for research in existing_research:
-        if research.get("sources"):
-            for source in research["sources"]:
-                if isinstance(source, dict):
-                    existing_urls.add(source.get("url", ""))
-    
-    # Check if any new URLs
-    new_urls = 0
+async def find_new_results(search_results: list) -> list:
+    """Search results whose URLs were never saved before
+
+    Result URLs are normalized and checked against every source ever saved:
+    the in-memory index answers known URLs, and the rest are confirmed with a
+    single indexed lookup (another worker may have saved them).
+    """
+    candidates = freshness.unknown(freshness.source_keys(search_results))
+    if candidates:
+        known = await find_known_sources(candidates)
+        freshness.remember(known)
+    return [r for r in search_results
+            if (key := freshness.normalize_url(r.get("url", ""))) and key not in freshness.known_urls]
+
+def split_near_duplicates(search_results: list) -> tuple[list, list]:
+    """Split results into (novel, duplicates) using the MinHash index of saved results and summaries"""
+    novel, duplicates = [], []
     for result in search_results:
-        if result.get("url") not in existing_urls:
-            new_urls += 1
-    
-    # Consider fresh if at least 2 new sources
-    return new_urls >= 2
+        match = freshness.find_near_duplicate(freshness.minhash(freshness.result_text(result)))
+        if match:
+            duplicates.append({"url": result.get("url"), "research_id": match[0], "similarity": match[2]})
+        else:
+            novel.append(result)
+    return novel, duplicates
+
+def find_duplicate_summary(summary: str) -> dict:
+    """Saved research whose summary is a near-duplicate of this one, if any"""
+    match = freshness.find_near_duplicate(freshness.minhash(summary), kinds=("summary",))
+    return {"research_id": match[0], "similarity": match[2]} if match else None
 
-def create_content_hash(summary: str) -> str:
-    """Create a hash of content to detect duplicates"""
-    # Use first 200 chars normalized
-    normalized = summary.lower().replace(" ", "")[:200]
-    return hashlib.md5(normalized.encode()).hexdigest()[:16]
+def research_fingerprints(search_results: list, summary: str) -> list:
+    """(kind, signature) pairs saved with a record for future near-duplicate checks"""
+    fingerprints = [("source", freshness.minhash(freshness.result_text(r))) for r in search_results]
+    fingerprints.append(("summary", freshness.minhash(summary)))
+    return [(kind, sig) for kind, sig in fingerprints if sig]
 
-def analyze_and_summarize(topic: str, search_results: list) -> dict:
+def record_skipped_calls(llm_calls: int, image_calls: int):
+    """Count paid calls avoided because a story was a near-duplicate"""
+    freshness.stats["near_duplicates"] += 1
+    freshness.stats["llm_calls_saved"] += llm_calls
+    freshness.stats["image_calls_saved"] += image_calls
+
+async def analyze_and_summarize(topic: str, search_results: list, use_cache: bool = True) -> dict:
     """Analyze search results and create summary"""
     results_text = ""
     sources = []
@@ -194,10 +295,10 @@ Provide a JSON response:
 
 Focus on 2024-2025 content. Be specific with numbers."""
 
-    content = call_openai([
+    content = await call_openai([
         {"role": "system", "content": "Research analyst for post-labor economics. Respond with valid JSON."},
         {"role": "user", "content": prompt}
-    ])
+    ], use_cache=use_cache)
     
     if not content:
         return {"summary": "", "key_stats": [], "is_breaking": False, "sources": sources}
@@ -211,95 +312,315 @@ Focus on 2024-2025 content. Be specific with numbers."""
     except:
         return {"summary": content, "key_stats": [], "is_breaking": False, "sources": sources}
 
-def run_news_check(generate_images: bool = True) -> dict:
+async def run_news_check(generate_images: bool = True, progress=None, query: str = None) -> dict:
     """Check for fresh news - called every 20 minutes"""
     print(f"[{datetime.now().strftime('%H:%M')}] Checking for fresh news...")
+    started = time.perf_counter()
+    timings = {}
     
-    # Pick a random news query
-    query = random.choice(NEWS_QUERIES)
+    # Pick a random news query unless the caller chose one
+    query = query or random.choice(NEWS_QUERIES)
     print(f"  Query: {query}")
     
     # Search for news
-    results = search_news(query)
+    report(progress, "search", query=query)
+    results = await timed(timings, "search", search_news(query))
     if not results:
         print("  No results found")
-        return {"status": "no_results", "query": query}
+        return {"status": "no_results", "query": query, "timings": timings}
     
     # Check if content is actually fresh
-    existing = get_latest_research(limit=20)
-    if not is_content_fresh(results, existing):
+    report(progress, "freshness_check", query=query)
+    new_results = await timed(timings, "freshness_check", find_new_results(results))
+    if len(new_results) < 2:
         print("  No fresh content detected")
-        return {"status": "not_fresh", "query": query}
+        return {"status": "not_fresh", "query": query, "timings": timings}
     
-    # Analyze the results
-    analysis = analyze_and_summarize(query, results)
+    # Syndicated copies of stories already covered have new URLs but the same text
+    novel, duplicates = split_near_duplicates(new_results)
+    if len(novel) < 2:
+        print(f"  Near-duplicate of research {duplicates[0]['research_id']}")
+        record_skipped_calls(llm_calls=2 if generate_images else 1, image_calls=1 if generate_images else 0)
+        return {"status": "near_duplicate", "query": query, "duplicates": duplicates, "timings": timings}
+    
+    report(progress, "summarize", query=query)
+    outcome = await write_up_news(query, results, generate_images, timings)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    if outcome["status"] == "saved":
+        print(f"  ✓ Saved new research (ID: {outcome['record_id']}) in {timings['total']}s")
+    return {**outcome, "query": query, "timings": timings}
+
+async def write_up_news(topic: str, results: list, generate_images: bool, timings: dict, save: bool = True) -> dict:
+    """Summarize fresh results and save them as one research record
+
+    Returns {"status": "saved" | "not_significant" | "near_duplicate" | "error", ...}.
+    With `save=False` a record worth keeping comes back unsaved, as
+    {"status": "ready", "record": ...}, for save_ready.
+    """
+    analysis = await timed(timings, "summarize", analyze_and_summarize(topic, results))
     
     # Skip if not breaking/significant
     if not analysis.get("is_breaking") and not analysis.get("summary"):
-        print("  Content not significant enough")
-        return {"status": "not_significant", "query": query}
+        print(f"  Content not significant enough ({topic})")
+        return {"status": "not_significant"}
     
-    # Generate image (returns base64 data)
-    image_data, image_prompt = None, None
-    if generate_images and analysis.get("summary"):
-        image_data, image_prompt = generate_image(query, analysis["summary"])
+    duplicate = find_duplicate_summary(analysis.get("summary", ""))
+    if duplicate:
+        print(f"  Summary repeats research {duplicate['research_id']}")
+        record_skipped_calls(llm_calls=1 if generate_images else 0, image_calls=1 if generate_images else 0)
+        return {"status": "near_duplicate", "duplicates": [duplicate]}
     
-    # Save to database (image_url will be set after we have the ID)
+    # Save the text now; the image queue generates and attaches the image afterwards
+    queue_image = generate_images and bool(analysis.get("summary"))
+    record = {
+        "topic": topic,
+        "summary": analysis.get("summary", ""),
+        "sources": analysis.get("sources", []),
+        "key_stats": analysis.get("key_stats", []),
+        "image_url": None,  # Will be constructed by frontend using ID
+        "fingerprints": research_fingerprints(results, analysis.get("summary", "")),
+        "queue_image": queue_image
+    }
+    if not save:
+        return {"status": "ready", "record": record}
     try:
-        record_id = save_research(
-            topic=query,
-            summary=analysis.get("summary", ""),
-            sources=analysis.get("sources", []),
-            key_stats=analysis.get("key_stats", []),
-            image_url=None,  # Will be constructed by frontend using ID
-            image_prompt=image_prompt,
-            image_data=image_data
-        )
-        print(f"  ✓ Saved new research (ID: {record_id})")
-        return {
-            "status": "saved",
-            "query": query,
-            "record_id": record_id,
-            "image_generated": image_data is not None
-        }
+        record_id = await timed(timings, "save", save_research(**record))
+    except Exception as e:
+        print(f"  Error saving: {e}")
+        return {"status": "error", "error": str(e)}
+    if queue_image:
+        image_queue.wake()
+    return {"status": "saved", "record_id": record_id, "image_queued": queue_image}
+
+async def save_ready(outcomes: list, saved_status: str, timings: dict):
+    """Save the record of every "ready" outcome in one transaction, so a cycle commits once
+
+    Each becomes `saved_status` with its record_id, or "error" if its record
+    could not be saved; the others are still kept.
+    """
+    ready = [o for o in outcomes if o["status"] == "ready"]
+    if not ready:
+        return
+    records = [o.pop("record") for o in ready]
+    try:
+        ids = await timed(timings, "save", save_research_batch(records, atomic=False))
     except Exception as e:
         print(f"  Error saving: {e}")
-        return {"status": "error", "query": query, "error": str(e)}
+        ids = [None] * len(records)
+    for outcome, record, research_id in zip(ready, records, ids):
+        if research_id is None:
+            outcome.update(status="error", error="could not save")
+        else:
+            outcome.update(status=saved_status, record_id=research_id, image_queued=record["queue_image"])
+    if any(research_id is not None and record["queue_image"] for record, research_id in zip(records, ids)):
+        image_queue.wake()
+
+def merge_results(results_by_query: dict) -> list:
+    """Merge search results from several queries, one entry per normalized URL
+
+    Each merged result lists the queries that found it under "queries".
+    """
+    merged = {}
+    for query, results in results_by_query.items():
+        for result in results:
+            key = freshness.normalize_url(result.get("url", ""))
+            if not key:
+                continue
+            if key not in merged:
+                merged[key] = {**result, "queries": []}  # Copy: search results are shared via the cache
+            merged[key]["queries"].append(query)
+    return list(merged.values())
+
+def story_topic(story: list) -> str:
+    """Topic for a story cluster: the news query that found most of its results"""
+    counts = {}
+    for result in story:
+        for query in result.get("queries", []):
+            counts[query] = counts.get(query, 0) + 1
+    return max(counts, key=counts.get) if counts else story[0].get("title", "")[:255]
+
+def sweep_outcomes(queries: list, per_query: list, new_results: list, saved_stories: list) -> dict:
+    """Outcome per query of a sweep: saved, not_saved, not_fresh or no_results"""
+    new_keys = set(freshness.source_keys(new_results))
+    saved_queries = {q for story in saved_stories for r in story for q in r.get("queries", [])}
+    outcomes = {}
+    for query, results in zip(queries, per_query):
+        if not results:
+            outcomes[query] = "no_results"
+        elif query in saved_queries:
+            outcomes[query] = "saved"
+        elif new_keys.isdisjoint(freshness.source_keys(results)):
+            outcomes[query] = "not_fresh"
+        else:
+            outcomes[query] = "not_saved"
+    return outcomes
+
+async def run_news_sweep(generate_images: bool = True, progress=None, queries: list = None) -> dict:
+    """Search news queries at once and write up each new story once
+
+    Results are merged across queries (all NEWS_QUERIES unless given), filtered
+    to URLs and stories not seen before, and clustered by content; each cluster
+    with at least NEWS_SWEEP_MIN_SOURCES results, biggest first, gets one summary
+    and one image (up to NEWS_SWEEP_MAX_STORIES). "query_outcomes" reports what
+    each query contributed.
+    """
+    queries = queries or NEWS_QUERIES
+    print(f"[{datetime.now().strftime('%H:%M')}] Sweeping {len(queries)} news queries...")
+    started = time.perf_counter()
+    timings = {}
+    
+    report(progress, "search", queries=len(queries))
+    per_query = await timed(timings, "search", asyncio.gather(*(search_news(q) for q in queries)))
+    merged = merge_results(dict(zip(queries, per_query)))
+    counts = {"queries": len(queries), "results": len(merged)}
+    if not merged:
+        print("  No results found")
+        return {"status": "no_results", **counts, "query_outcomes": {q: "no_results" for q in queries}, "timings": timings}
+    
+    report(progress, "freshness_check", results=len(merged))
+    new_results = await timed(timings, "freshness_check", find_new_results(merged))
+    novel, duplicates = split_near_duplicates(new_results)
+    clusters = freshness.cluster([freshness.minhash(freshness.result_text(r)) for r in novel])
+    stories = [[novel[i] for i in c] for c in clusters if len(c) >= NEWS_SWEEP_MIN_SOURCES]
+    counts.update(new=len(new_results), near_duplicates=len(duplicates), clusters=len(clusters), stories=len(stories))
+    print(f"  {counts['results']} results, {counts['new']} new, {len(stories)} stories")
+    if not stories:
+        outcomes = sweep_outcomes(queries, per_query, new_results, [])
+        return {"status": "not_fresh", **counts, "query_outcomes": outcomes, "timings": timings}
+    
+    # Biggest stories first; the rest wait for a later sweep
+    stories = stories[:NEWS_SWEEP_MAX_STORIES]
+    semaphore = asyncio.Semaphore(max(1, RESEARCH_CONCURRENCY))
+    
+    async def write_up_story(story: list) -> dict:
+        topic = story_topic(story)
+        story_timings = {}
+        async with semaphore:
+            outcome = await write_up_news(topic, story, generate_images, story_timings, save=False)
+        return {**outcome, "topic": topic, "sources": len(story), "timings": story_timings}
+    
+    report(progress, "summarize", stories=len(stories))
+    outcomes = await timed(timings, "summarize", asyncio.gather(*(write_up_story(s) for s in stories)))
+    report(progress, "save", stories=sum(o["status"] == "ready" for o in outcomes))
+    await save_ready(outcomes, "saved", timings)
+    timings["total"] = round(time.perf_counter() - started, 3)
+    saved_stories = [story for story, o in zip(stories, outcomes) if o["status"] == "saved"]
+    print(f"  ✓ Saved {len(saved_stories)}/{len(outcomes)} stories in {timings['total']}s")
+    return {
+        "status": "saved" if saved_stories else "no_new_stories",
+        **counts,
+        "saved": len(saved_stories),
+        "outcomes": list(outcomes),
+        "query_outcomes": sweep_outcomes(queries, per_query, new_results, saved_stories),
+        "timings": timings
+    }
+
+async def run_research(topic: str, force: bool = False, generate_images: bool = True, progress=None,
+                       save: bool = True) -> dict:
+    """Run research on a specific topic
 
-def run_research(topic: str, force: bool = False, generate_images: bool = True) -> dict:
-    """Run research on a specific topic"""
+    With `save=False` the record is returned unsaved ({"status": "ready", "record": ...}) for save_ready.
+    """
     print(f"Researching: {topic}")
+    started = time.perf_counter()
+    timings = {}
     
-    if not force and topic_exists_recently(topic, hours=CACHE_HOURS):
-        existing = get_similar_research(topic)
+    report(progress, "cache_check", topic=topic)
+    if not force and await timed(timings, "cache_check", topic_exists_recently(topic, hours=CACHE_HOURS)):
+        existing = await get_similar_research(topic)
         if existing:
-            return {"topic": topic, "status": "cached", "record_id": existing["id"], "cached": True}
+            return {"topic": topic, "status": "cached", "record_id": existing["id"], "cached": True, "timings": timings}
     
-    results = search_news(topic)
+    report(progress, "search", topic=topic)
+    results = await timed(timings, "search", search_news(topic))
     if not results:
-        return {"topic": topic, "status": "no_results"}
+        return {"topic": topic, "status": "no_results", "timings": timings}
     
-    analysis = analyze_and_summarize(topic, results)
+    if not force:
+        novel, duplicates = split_near_duplicates(results)
+        # Only skip when saved research actually matched and nothing new is left
+        if duplicates and not novel:
+            record_skipped_calls(llm_calls=2 if generate_images else 1, image_calls=1 if generate_images else 0)
+            return {"topic": topic, "status": "near_duplicate", "duplicates": duplicates, "cached": False, "timings": timings}
     
-    image_data, image_prompt = None, None
-    if generate_images:
-        image_data, image_prompt = generate_image(topic, analysis.get("summary", ""))
+    report(progress, "summarize", topic=topic)
+    analysis = await timed(timings, "summarize", analyze_and_summarize(topic, results, use_cache=not force))
     
+    duplicate = None if force else find_duplicate_summary(analysis.get("summary", ""))
+    if duplicate:
+        record_skipped_calls(llm_calls=1 if generate_images else 0, image_calls=1 if generate_images else 0)
+        return {"topic": topic, "status": "near_duplicate", "duplicates": [duplicate], "cached": False, "timings": timings}
+    
+    record = {
+        "topic": topic,
+        "summary": analysis.get("summary", ""),
+        "sources": analysis.get("sources", []),
+        "key_stats": analysis.get("key_stats", []),
+        "image_url": None,  # URL constructed by frontend using ID
+        "fingerprints": research_fingerprints(results, analysis.get("summary", "")),
+        "queue_image": generate_images
+    }
+    if not save:
+        timings["total"] = round(time.perf_counter() - started, 3)
+        return {"topic": topic, "status": "ready", "record": record, "cached": False, "timings": timings}
+    
+    report(progress, "save", topic=topic)
     try:
-        record_id = save_research(
-            topic=topic,
-            summary=analysis.get("summary", ""),
-            sources=analysis.get("sources", []),
-            key_stats=analysis.get("key_stats", []),
-            image_url=None,  # URL constructed by frontend using ID
-            image_prompt=image_prompt,
-            image_data=image_data
-        )
-        return {"topic": topic, "status": "success", "record_id": record_id, "has_image": image_data is not None, "cached": False}
+        record_id = await timed(timings, "save", save_research(**record))
+        if generate_images:
+            image_queue.wake()
+        timings["total"] = round(time.perf_counter() - started, 3)
+        return {"topic": topic, "status": "success", "record_id": record_id, "image_queued": generate_images, "cached": False, "timings": timings}
     except Exception as e:
-        return {"topic": topic, "status": "error", "message": str(e)}
+        return {"topic": topic, "status": "error", "message": str(e), "timings": timings}
 
-def run_all_research(force: bool = False, generate_images: bool = True) -> list:
-    """Run research on multiple fresh topics"""
+async def run_all_research(force: bool = False, generate_images: bool = True, progress=None) -> list:
+    """Run research on multiple fresh topics, RESEARCH_CONCURRENCY at a time, saving them in one transaction"""
     topics = random.sample(TOPIC_POOL, min(3, len(TOPIC_POOL)))
-    return [run_research(t, force=force, generate_images=generate_images) for t in topics]
+    started = time.perf_counter()
+    semaphore = asyncio.Semaphore(max(1, RESEARCH_CONCURRENCY))
+    
+    async def research_one(topic: str) -> dict:
+        async with semaphore:
+            return await run_research(topic, force=force, generate_images=generate_images, progress=progress, save=False)
+    
+    results = await asyncio.gather(*(research_one(t) for t in topics))
+    report(progress, "save", topics=sum(r["status"] == "ready" for r in results))
+    await save_ready(results, "success", {})
+    elapsed = time.perf_counter() - started
+    sequential = sum(r.get("timings", {}).get("total", 0) for r in results)
+    print(f"Researched {len(topics)} topics in {elapsed:.1f}s (sequential would be ~{sequential:.1f}s)")
+    return list(results)
+
+async def process_image_job(job: dict):
+    """Generate, resize and attach the image for a queued record (raises so the queue retries)"""
+    timings = {}
+    image_data, image_prompt = await generate_image(job["topic"], job.get("summary", ""), timings=timings)
+    if not image_data:
+        raise RuntimeError("image generation failed")
+    variants = await create_image_variants(image_data)
+    await attach_image(job["id"], image_data, image_prompt, variants)
+    forget_etags([job["id"]])
+    print(f"  ✓ Image attached to research {job['id']} ({timings})")
+
+async def backfill_image_variants(batch_size: int = 10, progress=None) -> dict:
+    """Generate variants for stored images that predate the variant pipeline"""
+    processed, failed, after_id = 0, 0, 0
+    while True:
+        ids = await get_ids_missing_variants(limit=batch_size, after_id=after_id)
+        if not ids:
+            break
+        report(progress, "batch", first_id=ids[0], last_id=ids[-1])
+        for research_id in ids:
+            after_id = research_id
+            image = await get_image_data(research_id)
+            variants = await create_image_variants(image["data"]) if image else []
+            if not variants:
+                failed += 1
+                continue
+            width = await asyncio.to_thread(image_width, image["data"])
+            await save_image_variants(research_id, variants, original_width=width)
+            forget_etags([research_id])
+            processed += 1
+    print(f"Image variant backfill: {processed} processed, {failed} failed")
+    return {"processed": processed, "failed": failed}
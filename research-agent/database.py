@@ -1,233 +1,1503 @@
 import os
 import json
+import time
 import psycopg
+from contextlib import asynccontextmanager
+from psycopg_pool import AsyncConnectionPool
 from datetime import datetime, timedelta
+import feed_cache
+import freshness
+from images import content_hash, sniff_media_type, image_width
 
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
-def get_connection():
-    """Get a database connection"""
-    return psycopg.connect(DATABASE_URL)
+# Connection pool settings
+DB_POOL_MIN_SIZE = int(os.environ.get("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+# Server-side prepare after N executions of a query ("" disables, e.g. behind pgbouncer)
+DB_PREPARE_THRESHOLD = os.environ.get("DB_PREPARE_THRESHOLD", "1")
 
-def init_db():
+# How long a cached row count may be served before re-counting (other workers may have written)
+COUNT_CACHE_SECONDS = float(os.environ.get("COUNT_CACHE_SECONDS", "30"))
+
+# SQL for a topic's lookup key: lowercased, whitespace collapsed and trimmed.
+# The topic_key column is generated from it, and lookups apply it to their argument.
+TOPIC_KEY_SQL = "btrim(regexp_replace(lower({}), '\\s+', ' ', 'g'))"
+
+# Text search configuration for the archive search column and queries
+SEARCH_CONFIG = "english"
+
+# Version of a record's stored images (original plus variants); it changes whenever an image is
+# attached or variants are backfilled, so image URLs carrying it (?v=) can be cached as immutable
+IMAGE_VERSION_SQL = ("(SELECT left(md5(string_agg(hash, ',' ORDER BY variant)), 16) "
+                     "FROM research_images WHERE research_id = {}.id)")
+
+# Columns read by row_to_research, in order
+RESEARCH_COLUMNS = ("id, topic, summary, sources, key_stats, image_url, image_prompt, created_at::text AS created_at, "
+                    f"image_status, {IMAGE_VERSION_SQL.format('research_updates')} AS image_version")
+
+# List views can ask for a compact projection: no sources, stats or prompt, and the summary
+# cut to a teaser in SQL so the full text never leaves the database (one extra character
+# is read to tell whether it was cut, without measuring the whole summary)
+TEASER_CHARS = int(os.environ.get("TEASER_CHARS", "240"))
+COMPACT_COLUMNS = (f"id, topic, left(summary, {TEASER_CHARS + 1}) AS teaser, "
+                   "image_url, created_at::text AS created_at, image_status, "
+                   f"{IMAGE_VERSION_SQL.format('research_updates')} AS image_version")
+
+# Image generation queue (rows with image_status 'pending'): attempts and retry backoff
+IMAGE_MAX_ATTEMPTS = int(os.environ.get("IMAGE_MAX_ATTEMPTS", "5"))
+IMAGE_RETRY_BASE_SECONDS = float(os.environ.get("IMAGE_RETRY_BASE_SECONDS", "60"))
+# A 'generating' claim older than this belongs to a worker that died; it becomes claimable again
+IMAGE_CLAIM_TIMEOUT_SECONDS = float(os.environ.get("IMAGE_CLAIM_TIMEOUT_SECONDS", "600"))
+
+pool = None
+_count_cache = {"value": None, "at": 0.0}
+
+async def open_pool():
+    """Open the shared async connection pool (called once at startup)"""
+    global pool
+    if pool is not None:
+        return pool
+    prepare_threshold = int(DB_PREPARE_THRESHOLD) if DB_PREPARE_THRESHOLD else None
+    pool = AsyncConnectionPool(
+        DATABASE_URL,
+        min_size=DB_POOL_MIN_SIZE,
+        max_size=DB_POOL_MAX_SIZE,
+        timeout=DB_POOL_TIMEOUT,
+        kwargs={"prepare_threshold": prepare_threshold},
+        check=AsyncConnectionPool.check_connection,  # Health check before handing out
+        name="research",
+        open=False
+    )
+    await pool.open(wait=True)
+    print(f"Database pool opened (min={DB_POOL_MIN_SIZE}, max={DB_POOL_MAX_SIZE})")
+    return pool
+
+async def close_pool():
+    """Close the shared connection pool (called once at shutdown)"""
+    global pool
+    if pool is not None:
+        await pool.close()
+        pool = None
+        print("Database pool closed")
+
+@asynccontextmanager
+async def get_connection():
+    """Borrow a pooled connection; use as `async with get_connection() as conn:`.
+
+    Commits on clean exit, rolls back on error, and returns the connection to the pool.
+    """
+    if pool is None:
+        await open_pool()
+    async with pool.connection() as conn:
+        yield conn
+
+async def init_db():
     """Create tables if they don't exist"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS research_updates (
-            id SERIAL PRIMARY KEY,
-            topic VARCHAR(255) NOT NULL,
-            summary TEXT NOT NULL,
-            sources JSONB DEFAULT '[]'::jsonb,
-            key_stats JSONB DEFAULT '[]'::jsonb,
-            image_url TEXT,
-            image_prompt TEXT,
-            image_data TEXT,
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    """)
-    
-    # Add image columns if they don't exist (for existing databases)
-    cur.execute("""
-        DO $$ 
-        BEGIN
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
-                          WHERE table_name='research_updates' AND column_name='image_url') THEN
-                ALTER TABLE research_updates ADD COLUMN image_url TEXT;
-            END IF;
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
-                          WHERE table_name='research_updates' AND column_name='image_prompt') THEN
-                ALTER TABLE research_updates ADD COLUMN image_prompt TEXT;
-            END IF;
-            IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
-                          WHERE table_name='research_updates' AND column_name='image_data') THEN
-                ALTER TABLE research_updates ADD COLUMN image_data TEXT;
-            END IF;
-        END $$;
-    """)
-    
-    # Create index on topic for faster lookups
-    cur.execute("""
-        CREATE INDEX IF NOT EXISTS idx_research_topic ON research_updates(topic)
-    """)
-    
-    conn.commit()
-    cur.close()
-    conn.close()
+    async with get_connection() as conn:
+        cur = conn.cursor()
+        
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS research_updates (
+                id SERIAL PRIMARY KEY,
+                topic VARCHAR(255) NOT NULL,
+                summary TEXT NOT NULL,
+                sources JSONB DEFAULT '[]'::jsonb,
+                key_stats JSONB DEFAULT '[]'::jsonb,
+                image_url TEXT,
+                image_prompt TEXT,
+                image_data TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Add image columns if they don't exist (for existing databases)
+        await cur.execute("""
+            DO $$ 
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                              WHERE table_name='research_updates' AND column_name='image_url') THEN
+                    ALTER TABLE research_updates ADD COLUMN image_url TEXT;
+                END IF;
+                IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                              WHERE table_name='research_updates' AND column_name='image_prompt') THEN
+                    ALTER TABLE research_updates ADD COLUMN image_prompt TEXT;
+                END IF;
+                IF NOT EXISTS (SELECT 1 FROM information_schema.columns 
+                              WHERE table_name='research_updates' AND column_name='image_data') THEN
+                    ALTER TABLE research_updates ADD COLUMN image_data TEXT;
+                END IF;
+            END $$;
+        """)
+        
+        # Normalized topic for cache checks; a btree on raw topic can't serve LIKE '%...%'
+        await cur.execute(f"""
+            ALTER TABLE research_updates ADD COLUMN IF NOT EXISTS topic_key TEXT
+            GENERATED ALWAYS AS ({TOPIC_KEY_SQL.format('topic')}) STORED
+        """)
+        await cur.execute("DROP INDEX IF EXISTS idx_research_topic")
+        
+        # Recent-research-for-topic probe: equality on topic_key, range on created_at
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_research_topic_key_created
+            ON research_updates(topic_key, created_at DESC)
+        """)
+        
+        # Keyset index for newest-first listing and cursor pagination
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_research_created_id ON research_updates(created_at DESC, id DESC)
+        """)
+        
+        # Full-text search over topic (A), summary (B) and key stats (C)
+        await cur.execute(f"""
+            ALTER TABLE research_updates ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(topic, '')), 'A') ||
+                setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(summary, '')), 'B') ||
+                setweight(jsonb_to_tsvector('{SEARCH_CONFIG}', coalesce(key_stats, '[]'::jsonb), '["string"]'), 'C')
+            ) STORED
+        """)
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_research_search ON research_updates USING gin (search_vector)
+        """)
+        
+        # Raw image bytes, content-addressed by sha256 (one row per variant)
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS research_images (
+                research_id INTEGER NOT NULL REFERENCES research_updates(id) ON DELETE CASCADE,
+                variant VARCHAR(32) NOT NULL DEFAULT 'original',
+                media_type VARCHAR(64) NOT NULL,
+                byte_size INTEGER NOT NULL,
+                hash CHAR(64) NOT NULL,
+                width INTEGER,
+                data BYTEA NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (research_id, variant)
+            )
+        """)
+        await cur.execute("ALTER TABLE research_images ADD COLUMN IF NOT EXISTS width INTEGER")
+        # Images are already compressed; skip TOAST compression attempts
+        await cur.execute("ALTER TABLE research_images ALTER COLUMN data SET STORAGE EXTERNAL")
+        
+        # Image generation runs after the text is saved: 'none' (not wanted), 'pending' (queued),
+        # 'generating' (claimed by a worker), 'ready' or 'failed' (out of attempts)
+        await cur.execute("""
+            ALTER TABLE research_updates
+                ADD COLUMN IF NOT EXISTS image_status VARCHAR(16) NOT NULL DEFAULT 'none',
+                ADD COLUMN IF NOT EXISTS image_attempts INTEGER NOT NULL DEFAULT 0,
+                ADD COLUMN IF NOT EXISTS image_next_attempt_at TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS image_claimed_at TIMESTAMP,
+                ADD COLUMN IF NOT EXISTS image_error TEXT
+        """)
+        await cur.execute("""
+            UPDATE research_updates r SET image_status = 'ready'
+            WHERE image_status = 'none'
+            AND EXISTS (SELECT 1 FROM research_images i WHERE i.research_id = r.id AND i.variant = 'original')
+        """)
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_research_image_queue ON research_updates(image_next_attempt_at, id)
+            WHERE image_status IN ('pending', 'generating')
+        """)
+        
+        # Every source URL ever saved, normalized; rows outlive retention so old stories stay known
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS research_sources (
+                url_key TEXT PRIMARY KEY,
+                url TEXT NOT NULL,
+                research_id INTEGER,
+                first_seen TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # MinHash signatures of saved search results and summaries, for near-duplicate checks
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS research_fingerprints (
+                id SERIAL PRIMARY KEY,
+                research_id INTEGER NOT NULL,
+                kind VARCHAR(16) NOT NULL,
+                signature BYTEA NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Memoized chat completions, keyed by a hash of the request (see llm_cache.py)
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key CHAR(64) PRIMARY KEY,
+                model VARCHAR(64) NOT NULL,
+                response TEXT NOT NULL,
+                total_tokens INTEGER DEFAULT 0,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_used_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache(last_used_at)
+        """)
+        
+        # Outcome history per news query, for the adaptive query planner (see query_planner.py)
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS query_stats (
+                query TEXT PRIMARY KEY,
+                checks INTEGER NOT NULL DEFAULT 0,
+                saved INTEGER NOT NULL DEFAULT 0,
+                not_saved INTEGER NOT NULL DEFAULT 0,
+                not_fresh INTEGER NOT NULL DEFAULT 0,
+                no_results INTEGER NOT NULL DEFAULT 0,
+                alpha DOUBLE PRECISION NOT NULL DEFAULT 0,
+                beta DOUBLE PRECISION NOT NULL DEFAULT 0,
+                last_outcome VARCHAR(16),
+                last_checked_at TIMESTAMP
+            )
+        """)
+        
+        # Cluster-wide ingestion schedule: the leader's lease plus state that survives failover
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS scheduler_state (
+                name VARCHAR(64) PRIMARY KEY,
+                holder TEXT,
+                lease_expires_at TIMESTAMPTZ,
+                check_count INTEGER NOT NULL DEFAULT 0,
+                interval_minutes DOUBLE PRECISION,
+                next_run_at TIMESTAMPTZ,
+                last_run_at TIMESTAMPTZ,
+                last_status VARCHAR(32)
+            )
+        """)
+        
+        # Background jobs (see jobs.py): shared so any worker can report on a job, and so
+        # identical submissions coalesce cluster-wide (one active job per coalesce_key)
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS research_jobs (
+                id VARCHAR(32) PRIMARY KEY,
+                kind VARCHAR(32) NOT NULL,
+                params JSONB NOT NULL DEFAULT '{}'::jsonb,
+                coalesce_key TEXT NOT NULL,
+                status VARCHAR(16) NOT NULL,
+                stage VARCHAR(64),
+                stages JSONB NOT NULL DEFAULT '[]'::jsonb,
+                result JSONB,
+                error TEXT,
+                owner TEXT,
+                version INTEGER NOT NULL DEFAULT 0,
+                created_at TIMESTAMPTZ DEFAULT NOW(),
+                started_at TIMESTAMPTZ,
+                finished_at TIMESTAMPTZ,
+                heartbeat_at TIMESTAMPTZ DEFAULT NOW()
+            )
+        """)
+        await cur.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_research_jobs_active ON research_jobs(coalesce_key)
+            WHERE status IN ('queued', 'running')
+        """)
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_research_jobs_created ON research_jobs(created_at DESC)
+        """)
+        
+        # One row per topic (by topic_key) for the history view, kept current by statement-level
+        # triggers so inserts, imports, retention and clears all maintain it without re-aggregating
+        await cur.execute("""
+            CREATE TABLE IF NOT EXISTS topic_stats (
+                topic_key TEXT PRIMARY KEY,
+                topic VARCHAR(255) NOT NULL,
+                research_count INTEGER NOT NULL,
+                first_seen TIMESTAMP,
+                last_seen TIMESTAMP,
+                latest_id INTEGER
+            )
+        """)
+        await cur.execute("""
+            CREATE INDEX IF NOT EXISTS idx_topic_stats_last_seen ON topic_stats(last_seen DESC, latest_id DESC)
+        """)
+        await cur.execute("""
+            CREATE OR REPLACE FUNCTION topic_stats_insert() RETURNS trigger AS $$
+            BEGIN
+                INSERT INTO topic_stats AS s (topic_key, topic, research_count, first_seen, last_seen, latest_id)
+                SELECT topic_key,
+                       (array_agg(topic ORDER BY created_at DESC, id DESC))[1],
+                       COUNT(*), MIN(created_at), MAX(created_at),
+                       (array_agg(id ORDER BY created_at DESC, id DESC))[1]
+                FROM inserted_rows
+                GROUP BY topic_key
+                ON CONFLICT (topic_key) DO UPDATE SET
+                    research_count = s.research_count + EXCLUDED.research_count,
+                    first_seen = LEAST(s.first_seen, EXCLUDED.first_seen),
+                    topic = CASE WHEN (EXCLUDED.last_seen, EXCLUDED.latest_id) > (s.last_seen, s.latest_id)
+                                 THEN EXCLUDED.topic ELSE s.topic END,
+                    latest_id = CASE WHEN (EXCLUDED.last_seen, EXCLUDED.latest_id) > (s.last_seen, s.latest_id)
+                                     THEN EXCLUDED.latest_id ELSE s.latest_id END,
+                    last_seen = GREATEST(s.last_seen, EXCLUDED.last_seen);
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        # Deletes decrement counts; only topics that lost their oldest or newest row re-read
+        # their bounds, each through idx_research_topic_key_created
+        await cur.execute("""
+            CREATE OR REPLACE FUNCTION topic_stats_delete() RETURNS trigger AS $$
+            BEGIN
+                UPDATE topic_stats s SET research_count = s.research_count - d.n
+                FROM (SELECT topic_key, COUNT(*) AS n FROM deleted_rows GROUP BY topic_key) d
+                WHERE s.topic_key = d.topic_key;
+                DELETE FROM topic_stats
+                WHERE research_count <= 0 AND topic_key IN (SELECT topic_key FROM deleted_rows);
+                UPDATE topic_stats s SET topic = r.topic, last_seen = r.created_at, latest_id = r.id
+                FROM (SELECT DISTINCT topic_key FROM deleted_rows d
+                      WHERE EXISTS (SELECT 1 FROM topic_stats t WHERE t.topic_key = d.topic_key AND t.latest_id = d.id)) k,
+                     LATERAL (SELECT id, topic, created_at FROM research_updates
+                              WHERE topic_key = k.topic_key
+                              ORDER BY created_at DESC, id DESC LIMIT 1) r
+                WHERE s.topic_key = k.topic_key;
+                UPDATE topic_stats s SET first_seen = (
+                    SELECT created_at FROM research_updates
+                    WHERE topic_key = s.topic_key ORDER BY created_at LIMIT 1
+                )
+                FROM (SELECT topic_key, MIN(created_at) AS oldest FROM deleted_rows GROUP BY topic_key) d
+                WHERE s.topic_key = d.topic_key AND d.oldest <= s.first_seen;
+                RETURN NULL;
+            END
+            $$ LANGUAGE plpgsql
+        """)
+        # First run: install the triggers and build the table from existing rows in the same
+        # transaction (the ALTER TABLEs above already hold the table lock, so no write slips in between)
+        await cur.execute("""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_trigger WHERE tgname = 'research_topic_stats_insert') THEN
+                    CREATE TRIGGER research_topic_stats_insert AFTER INSERT ON research_updates
+                        REFERENCING NEW TABLE AS inserted_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION topic_stats_insert();
+                    CREATE TRIGGER research_topic_stats_delete AFTER DELETE ON research_updates
+                        REFERENCING OLD TABLE AS deleted_rows
+                        FOR EACH STATEMENT EXECUTE FUNCTION topic_stats_delete();
+                    DELETE FROM topic_stats;
+                    INSERT INTO topic_stats (topic_key, topic, research_count, first_seen, last_seen, latest_id)
+                    SELECT topic_key,
+                           (array_agg(topic ORDER BY created_at DESC, id DESC))[1],
+                           COUNT(*), MIN(created_at), MAX(created_at),
+                           (array_agg(id ORDER BY created_at DESC, id DESC))[1]
+                    FROM research_updates
+                    GROUP BY topic_key;
+                END IF;
+            END $$;
+        """)
+        
+        await cur.close()
+    
+    await create_trigram_index()
     print("Database initialized successfully")
-
-def topic_exists_recently(topic: str, hours: int = 24) -> bool:
-    """Check if a topic has been researched within the last N hours"""
-    conn = get_connection()
-    cur = conn.cursor()
     
-    # Normalize topic for comparison (lowercase, trimmed)
-    normalized_topic = topic.lower().strip()
+    indexed = await backfill_source_index()
+    if indexed:
+        print(f"Indexed {indexed} source URLs from existing research")
     
-    cur.execute("""
-        SELECT COUNT(*) FROM research_updates
-        WHERE LOWER(topic) LIKE %s
-        AND created_at > NOW() - INTERVAL '%s hours'
-    """, (f"%{normalized_topic}%", hours))
+    fingerprinted = await backfill_fingerprints()
+    if fingerprinted:
+        print(f"Fingerprinted {fingerprinted} existing summaries")
     
-    count = cur.fetchone()[0]
-    cur.close()
-    conn.close()
-    return count > 0
+    migrated = await migrate_image_data()
+    if migrated:
+        print(f"Migrated {migrated} base64 images to research_images")
+
+async def create_trigram_index() -> bool:
+    """Trigram index for fuzzy topic matches (skipped if pg_trgm can't be installed)"""
+    try:
+        async with get_connection() as conn:
+            await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            await conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_research_topic_key_trgm
+                ON research_updates USING gin (topic_key gin_trgm_ops)
+            """)
+        return True
+    except psycopg.Error as e:
+        print(f"Trigram index unavailable, fuzzy topic matches will scan: {e}")
+        return False
+
+async def migrate_image_data(batch_size: int = 20) -> int:
+    """Move legacy base64 research_updates.image_data into research_images, in small batches
+
+    Moved rows are marked image_status 'ready': the status backfill in init_db
+    runs before this migration, so it never sees them.
+    """
+    migrated = 0
+    while True:
+        async with get_connection() as conn:
+            cur = await conn.execute("""
+                WITH batch AS (
+                    SELECT id, decode(image_data, 'base64') AS data
+                    FROM research_updates
+                    WHERE image_data IS NOT NULL
+                    ORDER BY id
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                ), moved AS (
+                    INSERT INTO research_images (research_id, variant, media_type, byte_size, hash, data)
+                    SELECT id, 'original', 'image/png', length(data), encode(sha256(data), 'hex'), data
+                    FROM batch
+                    ON CONFLICT (research_id, variant) DO NOTHING
+                )
+                UPDATE research_updates r SET image_data = NULL, image_status = 'ready'
+                FROM batch WHERE r.id = batch.id
+            """, (batch_size,))
+            moved = cur.rowcount
+        if moved <= 0:
+            return migrated
+        migrated += moved
 
-def get_similar_research(topic: str, limit: int = 1):
+async def topic_exists_recently(topic: str, hours: int = 24) -> bool:
+    """Check if a topic has been researched within the last N hours"""
+    # Single probe of idx_research_topic_key_created
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT EXISTS (
+                SELECT 1 FROM research_updates
+                WHERE topic_key = {TOPIC_KEY_SQL.format('%s')}
+                AND created_at > NOW() - %s * INTERVAL '1 hour'
+            )
+        """, (topic, hours))
+        return (await cur.fetchone())[0]
+
+async def get_similar_research(topic: str, limit: int = 1):
     """Get existing research similar to the given topic"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
     normalized_topic = topic.lower().strip()
     keywords = normalized_topic.split()[:3]  # Use first 3 words
     
     # Build search pattern
     pattern = '%' + '%'.join(keywords) + '%'
     
-    cur.execute("""
-        SELECT id, topic, summary, sources, key_stats, image_url, image_prompt, created_at::text
-        FROM research_updates
-        WHERE LOWER(topic) LIKE %s
-        ORDER BY created_at DESC
-        LIMIT %s
-    """, (pattern, limit))
+    # Exact topic first (composite index); the keyword pattern (trigram index) only runs if that finds nothing.
+    # ORDER BY is qualified: a bare created_at would sort RESEARCH_COLUMNS' text alias, not the index order
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            (SELECT {RESEARCH_COLUMNS} FROM research_updates
+             WHERE topic_key = {TOPIC_KEY_SQL.format('%s')}
+             ORDER BY research_updates.created_at DESC LIMIT %s)
+            UNION ALL
+            (SELECT {RESEARCH_COLUMNS} FROM research_updates
+             WHERE topic_key LIKE %s
+             ORDER BY research_updates.created_at DESC LIMIT %s)
+            LIMIT %s
+        """, (topic, limit, pattern, limit, limit))
+        rows = await cur.fetchall()
+    
+    return row_to_research(rows[0]) if rows else None
+
+async def save_research(topic: str, summary: str, sources: list = None, key_stats: list = None, 
+                  image_url: str = None, image_prompt: str = None, image_data: bytes = None,
+                  image_variants: list = None, fingerprints: list = None, queue_image: bool = False):
+    """Save a research update (and its raw image bytes, variants and fingerprints, if any) to the database
+
+    `queue_image` saves the text now and leaves the image to the image queue.
+    """
+    ids = await save_research_batch([{
+        "topic": topic, "summary": summary, "sources": sources, "key_stats": key_stats,
+        "image_url": image_url, "image_prompt": image_prompt, "image_data": image_data,
+        "image_variants": image_variants, "fingerprints": fingerprints, "queue_image": queue_image
+    }])
+    return ids[0]
+
+async def save_research_batch(records: list, atomic: bool = True) -> list:
+    """Save many research updates in one transaction, so an ingestion cycle commits once
+
+    Each record is a dict of save_research's keyword arguments. Returns the new
+    ids in order. With `atomic`, any failure rolls back the whole batch and
+    raises; otherwise the batch is tried under one savepoint, and only if that
+    fails does each record get its own savepoint, with None in place of the id
+    of one that fails.
+    """
+    if not records:
+        return []
+    async with get_connection() as conn:
+        async with conn.transaction():
+            if atomic:
+                ids = await insert_research_rows(conn, records)
+            else:
+                try:
+                    async with conn.transaction():
+                        ids = await insert_research_rows(conn, records)
+                except Exception as e:
+                    print(f"Batch save failed, saving {len(records)} records one by one: {e}")
+                    ids = []
+                    for record in records:
+                        try:
+                            async with conn.transaction():
+                                ids.extend(await insert_research_rows(conn, [record]))
+                        except Exception as e:
+                            print(f"Could not save research '{str(record.get('topic'))[:80]}': {e}")
+                            ids.append(None)
+    
+    for research_id, record in zip(ids, records):
+        if research_id is None:
+            continue
+        freshness.remember(row[0] for row in source_rows(research_id, record.get("sources")))
+        for kind, signature in record.get("fingerprints") or []:
+            freshness.add_signature(research_id, kind, signature)
+    if any(research_id is not None for research_id in ids):
+        invalidate_count()
+        feed_cache.bump_version()
+    return ids
+
+async def insert_research_rows(conn, records: list) -> list:
+    """Insert research records with their images, source keys and fingerprints on an open connection
+
+    One pipelined executemany per table, so round trips don't grow with the
+    batch. Returns the new ids in order.
+    """
+    rows = []
+    for record in records:
+        image_status = "ready" if record.get("image_data") else ("pending" if record.get("queue_image") else "none")
+        rows.append((record["topic"], record["summary"], json.dumps(record.get("sources") or []),
+                     json.dumps(record.get("key_stats") or []), record.get("image_url"),
+                     record.get("image_prompt"), image_status))
     
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+    async with conn.cursor() as cur:
+        await cur.executemany("""
+            INSERT INTO research_updates (topic, summary, sources, key_stats, image_url, image_prompt,
+                                          image_status, image_next_attempt_at)
+            VALUES (%s, %s, %s::jsonb, %s::jsonb, %s, %s, %s, NOW())
+            RETURNING id
+        """, rows, returning=True)
+        ids = []
+        while True:
+            ids.append((await cur.fetchone())[0])
+            if not cur.nextset():
+                break
+        
+        images, sources, fingerprints = [], [], []
+        for research_id, record in zip(ids, records):
+            if record.get("image_data"):
+                images.append(image_row(research_id, record["image_data"], width=image_width(record["image_data"])))
+            for v in record.get("image_variants") or []:
+                images.append(image_row(research_id, v["data"], v["variant"], v["media_type"], v["width"]))
+            sources.extend(source_rows(research_id, record.get("sources")))
+            fingerprints.extend(fingerprint_rows(research_id, record.get("fingerprints")))
+        if images:
+            await cur.executemany(IMAGE_UPSERT_SQL, images)
+        if sources:
+            await cur.executemany(SOURCE_INSERT_SQL, sources)
+        if fingerprints:
+            await cur.executemany(FINGERPRINT_INSERT_SQL, fingerprints)
+        # Delivered to every worker's listener when the transaction commits
+        await cur.executemany("SELECT pg_notify('research_events', %s)",
+                              [(json.dumps({"type": "research", "id": research_id}),) for research_id in ids])
+    return ids
+
+SOURCE_INSERT_SQL = """
+    INSERT INTO research_sources (url_key, url, research_id)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (url_key) DO NOTHING
+"""
+
+def source_rows(research_id: int, sources: list) -> list:
+    """(url_key, url, research_id) rows for a research entry's source URLs"""
+    rows = []
+    for source in sources or []:
+        if isinstance(source, dict) and source.get("url"):
+            key = freshness.normalize_url(source["url"])
+            if key:
+                rows.append((key, source["url"], research_id))
+    return rows
+
+async def index_sources(conn, research_id: int, sources: list) -> list:
+    """Record normalized source URLs for a research entry on an open connection"""
+    rows = source_rows(research_id, sources)
+    if rows:
+        async with conn.cursor() as cur:
+            await cur.executemany(SOURCE_INSERT_SQL, rows)
+    return [row[0] for row in rows]
+
+async def backfill_source_index(batch_size: int = 500) -> int:
+    """Fill research_sources from existing research rows (only when the index is empty)"""
+    async with get_connection() as conn:
+        cur = await conn.execute("SELECT EXISTS (SELECT 1 FROM research_sources)")
+        if (await cur.fetchone())[0]:
+            return 0
     
+    indexed, after_id = 0, 0
+    while True:
+        async with get_connection() as conn:
+            cur = await conn.execute("""
+                SELECT id, sources FROM research_updates
+                WHERE id > %s ORDER BY id LIMIT %s
+            """, (after_id, batch_size))
+            rows = await cur.fetchall()
+            if not rows:
+                return indexed
+            for research_id, sources in rows:
+                indexed += len(await index_sources(conn, research_id, sources))
+            after_id = rows[-1][0]
+
+async def load_source_index():
+    """Load every known source key into the in-memory freshness index"""
+    async with get_connection() as conn:
+        cur = await conn.execute("SELECT url_key FROM research_sources")
+        rows = await cur.fetchall()
+    freshness.load_known(row[0] for row in rows)
+    return len(rows)
+
+async def find_known_sources(keys: list) -> set:
+    """Which of the given source keys are already indexed (single primary-key probe)"""
+    if not keys:
+        return set()
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            SELECT url_key FROM research_sources WHERE url_key = ANY(%s)
+        """, (list(keys),))
+        rows = await cur.fetchall()
+    return {row[0] for row in rows}
+
+FINGERPRINT_INSERT_SQL = """
+    INSERT INTO research_fingerprints (research_id, kind, signature)
+    VALUES (%s, %s, %s)
+"""
+
+def fingerprint_rows(research_id: int, fingerprints: list) -> list:
+    """research_fingerprints rows for (kind, MinHash signature) pairs"""
+    return [(research_id, kind, freshness.signature_to_bytes(sig)) for kind, sig in fingerprints or [] if sig]
+
+async def insert_fingerprints(conn, research_id: int, fingerprints: list):
+    """Record (kind, MinHash signature) pairs for a research entry on an open connection"""
+    rows = fingerprint_rows(research_id, fingerprints)
     if rows:
-        row = rows[0]
-        return {
-            "id": row[0],
-            "topic": row[1],
-            "summary": row[2],
-            "sources": row[3],
-            "key_stats": row[4],
-            "image_url": row[5],
-            "image_prompt": row[6],
-            "created_at": row[7]
-        }
-    return None
-
-def save_research(topic: str, summary: str, sources: list = None, key_stats: list = None, 
-                  image_url: str = None, image_prompt: str = None, image_data: str = None):
-    """Save a research update to the database"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    sources_json = json.dumps(sources or [])
-    stats_json = json.dumps(key_stats or [])
-    
-    cur.execute("""
-        INSERT INTO research_updates (topic, summary, sources, key_stats, image_url, image_prompt, image_data)
-        VALUES (%s, %s, %s::jsonb, %s::jsonb, %s, %s, %s)
-        RETURNING id
-    """, (topic, summary, sources_json, stats_json, image_url, image_prompt, image_data))
-    
-    result = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
-    return result[0]
-
-def get_latest_research(limit: int = 10):
-    """Get the latest research updates"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT id, topic, summary, sources, key_stats, image_url, image_prompt,
-               created_at::text as created_at
-        FROM research_updates
-        ORDER BY created_at DESC
-        LIMIT %s
-    """, (limit,))
-    
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+        async with conn.cursor() as cur:
+            await cur.executemany(FINGERPRINT_INSERT_SQL, rows)
+
+async def backfill_fingerprints(batch_size: int = 500) -> int:
+    """Fingerprint summaries of existing research rows (only when the table is empty)"""
+    async with get_connection() as conn:
+        cur = await conn.execute("SELECT EXISTS (SELECT 1 FROM research_fingerprints)")
+        if (await cur.fetchone())[0]:
+            return 0
     
-    # Convert to list of dicts
-    results = []
-    for row in rows:
-        results.append({
-            "id": row[0],
-            "topic": row[1],
-            "summary": row[2],
-            "sources": row[3],
-            "key_stats": row[4],
-            "image_url": row[5],
-            "image_prompt": row[6],
-            "created_at": row[7]
-        })
-    return results
-
-def get_all_topics():
-    """Get all unique topics that have been researched"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        SELECT DISTINCT topic, MAX(created_at)::text as last_updated
-        FROM research_updates
-        GROUP BY topic
-        ORDER BY MAX(created_at) DESC
-    """)
-    
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
-    
-    return [{"topic": row[0], "last_updated": row[1]} for row in rows]
-
-def cleanup_old_research(keep_count: int = 100):
-    """Remove old research entries, keeping only the most recent ones"""
-    conn = get_connection()
-    cur = conn.cursor()
-    
-    cur.execute("""
-        DELETE FROM research_updates
-        WHERE id NOT IN (
-            SELECT id FROM research_updates
-            ORDER BY created_at DESC
+    fingerprinted, after_id = 0, 0
+    while True:
+        async with get_connection() as conn:
+            cur = await conn.execute("""
+                SELECT id, summary FROM research_updates
+                WHERE id > %s ORDER BY id LIMIT %s
+            """, (after_id, batch_size))
+            rows = await cur.fetchall()
+            if not rows:
+                return fingerprinted
+            for research_id, summary in rows:
+                signature = freshness.minhash(summary)
+                if signature:
+                    await insert_fingerprints(conn, research_id, [("summary", signature)])
+                    fingerprinted += 1
+            after_id = rows[-1][0]
+
+async def load_fingerprint_index() -> int:
+    """Load every saved signature into the in-memory LSH index"""
+    async with get_connection() as conn:
+        cur = await conn.execute("SELECT research_id, kind, signature FROM research_fingerprints", binary=True)
+        rows = await cur.fetchall()
+    return freshness.load_signatures(rows)
+
+IMAGE_UPSERT_SQL = """
+    INSERT INTO research_images (research_id, variant, media_type, byte_size, hash, width, data)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+    ON CONFLICT (research_id, variant) DO UPDATE
+    SET media_type = EXCLUDED.media_type, byte_size = EXCLUDED.byte_size, hash = EXCLUDED.hash,
+        width = EXCLUDED.width, data = EXCLUDED.data, created_at = CURRENT_TIMESTAMP
+"""
+
+def image_row(research_id: int, data: bytes, variant: str = "original", media_type: str = None,
+              width: int = None) -> tuple:
+    """research_images row for image bytes"""
+    return (research_id, variant, media_type or sniff_media_type(data), len(data), content_hash(data), width, data)
+
+async def insert_image(conn, research_id: int, data: bytes, variant: str = "original",
+                       media_type: str = None, width: int = None):
+    """Store image bytes for a research entry on an open connection (replaces an existing variant)"""
+    await conn.execute(IMAGE_UPSERT_SQL, image_row(research_id, data, variant, media_type, width))
+
+async def save_image_variants(research_id: int, variants: list, original_width: int = None):
+    """Attach generated variants to an existing research entry in one transaction"""
+    async with get_connection() as conn:
+        for v in variants:
+            await insert_image(conn, research_id, v["data"], v["variant"], v["media_type"], v["width"])
+        if original_width:
+            await conn.execute("""
+                UPDATE research_images SET width = %s
+                WHERE research_id = %s AND variant = 'original' AND width IS NULL
+            """, (original_width, research_id))
+        await notify_change(conn, "variants", research_id)
+
+async def claim_image_job() -> dict:
+    """Claim the next queued image (SKIP LOCKED, so workers never share a row)
+
+    Returns {id, topic, summary, attempts} or None when nothing is due.
+    """
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            UPDATE research_updates r
+            SET image_status = 'generating', image_claimed_at = NOW(), image_attempts = r.image_attempts + 1
+            WHERE r.id = (
+                SELECT id FROM research_updates
+                WHERE (image_status = 'pending' AND image_next_attempt_at <= NOW())
+                   OR (image_status = 'generating' AND image_claimed_at < NOW() - %s * INTERVAL '1 second')
+                ORDER BY image_next_attempt_at, id
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING r.id, r.topic, r.summary, r.image_attempts
+        """, (IMAGE_CLAIM_TIMEOUT_SECONDS,))
+        row = await cur.fetchone()
+    return {"id": row[0], "topic": row[1], "summary": row[2], "attempts": row[3]} if row else None
+
+async def attach_image(research_id: int, image_data: bytes, image_prompt: str, variants: list = None):
+    """Store a generated image and its variants and mark the record's image ready"""
+    async with get_connection() as conn:
+        await insert_image(conn, research_id, image_data, width=image_width(image_data))
+        for v in variants or []:
+            await insert_image(conn, research_id, v["data"], v["variant"], v["media_type"], v["width"])
+        await conn.execute("""
+            UPDATE research_updates
+            SET image_status = 'ready', image_prompt = %s, image_error = NULL, image_claimed_at = NULL
+            WHERE id = %s
+        """, (image_prompt, research_id))
+        await notify_change(conn, "image", research_id)
+    feed_cache.bump_version()
+
+async def fail_image_job(research_id: int, error: str) -> str:
+    """Put a failed image back in the queue with exponential backoff, or mark it failed for good"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            UPDATE research_updates
+            SET image_status = CASE WHEN image_attempts >= %s THEN 'failed' ELSE 'pending' END,
+                image_next_attempt_at = NOW() + %s * power(2, image_attempts - 1) * INTERVAL '1 second',
+                image_claimed_at = NULL,
+                image_error = %s
+            WHERE id = %s
+            RETURNING image_status
+        """, (IMAGE_MAX_ATTEMPTS, IMAGE_RETRY_BASE_SECONDS, error[:500], research_id))
+        row = await cur.fetchone()
+        if row and row[0] == "failed":
+            await notify_change(conn, "image", research_id)
+    return row[0] if row else None
+
+async def queue_missing_images() -> int:
+    """Queue image generation for every record without an image (including failed ones)"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            UPDATE research_updates r
+            SET image_status = 'pending', image_attempts = 0, image_next_attempt_at = NOW(), image_error = NULL
+            WHERE image_status IN ('none', 'failed')
+            AND NOT EXISTS (SELECT 1 FROM research_images i WHERE i.research_id = r.id AND i.variant = 'original')
+        """)
+        queued = cur.rowcount
+    if queued:
+        feed_cache.bump_version()
+    return queued
+
+async def count_image_queue() -> dict:
+    """Number of records per image_status"""
+    async with get_connection() as conn:
+        cur = await conn.execute("SELECT image_status, COUNT(*) FROM research_updates GROUP BY image_status")
+        return dict(await cur.fetchall())
+
+async def get_ids_missing_variants(limit: int = 20, after_id: int = 0) -> list:
+    """Research ids (ascending, > after_id) that have an original image but no variants yet"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            SELECT research_id FROM research_images
+            WHERE research_id > %s
+            GROUP BY research_id
+            HAVING bool_and(variant = 'original')
+            ORDER BY research_id
             LIMIT %s
-        )
-    """, (keep_count,))
+        """, (after_id, limit))
+        rows = await cur.fetchall()
+    return [row[0] for row in rows]
+
+async def get_latest_research(limit: int = 10, offset: int = 0, before: tuple = None, view: str = "full"):
+    """Get the latest research updates, newest first
+
+    `before` is a (created_at, id) keyset cursor: only rows strictly older are returned.
+    `view="compact"` returns COMPACT_COLUMNS records (see row_to_compact) instead of full ones.
+    """
+    compact = view == "compact"
+    where = ""
+    params = []
+    # Columns are qualified because RESEARCH_COLUMNS aliases created_at::text as created_at;
+    # a bare ORDER BY created_at would sort the text and skip idx_research_created_id
+    if before:
+        where = "WHERE (created_at, id) < (%s::timestamp, %s)"
+        params.extend(before)
+    params.extend([limit, offset])
     
-    deleted = cur.rowcount
-    conn.commit()
-    cur.close()
-    conn.close()
-    return deleted
+    # The page is picked from the index alone (skipped OFFSET rows never reach the heap),
+    # then only its rows are fetched and projected, teaser included
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            WITH page AS (
+                SELECT id FROM research_updates
+                {where}
+                ORDER BY research_updates.created_at DESC, research_updates.id DESC
+                LIMIT %s OFFSET %s
+            )
+            SELECT {COMPACT_COLUMNS if compact else RESEARCH_COLUMNS}
+            FROM page JOIN research_updates USING (id)
+            ORDER BY research_updates.created_at DESC, research_updates.id DESC
+        """, params)
+        rows = await cur.fetchall()
+    
+    # Convert to list of dicts
+    return [row_to_compact(row) if compact else row_to_research(row) for row in rows]
 
-def clear_all_research():
-    """Delete ALL research entries - use with caution"""
-    conn = get_connection()
-    cur = conn.cursor()
+async def stream_research(include_images: bool = False, batch_size: int = 500):
+    """Yield every research record, oldest id first, from a server-side cursor
+
+    Only `batch_size` rows are held in memory at a time. With `include_images`,
+    each record with an original image carries image = {hash, media_type, data}.
+    """
+    image_join = ""
+    image_columns = ""
+    if include_images:
+        image_columns = ", i.hash, i.media_type, i.data"
+        image_join = """
+            LEFT JOIN LATERAL (
+                SELECT hash, media_type, data FROM research_images
+                WHERE research_id = research_updates.id AND variant = 'original'
+            ) i ON true"""
     
-    cur.execute("DELETE FROM research_updates")
+    async with get_connection() as conn:
+        async with conn.cursor(name="research_export") as cur:
+            cur.itersize = batch_size
+            await cur.execute(f"""
+                SELECT {RESEARCH_COLUMNS}{image_columns}
+                FROM research_updates{image_join}
+                ORDER BY id
+            """, binary=True)
+            async for row in cur:
+                record = row_to_research(row)
+                if include_images and row[10] is not None:
+                    record["image"] = {"hash": row[10].strip(), "media_type": row[11], "data": row[12]}
+                yield record
+
+IMPORT_COLUMNS = ("id, topic, summary, sources, key_stats, image_url, image_prompt, created_at, image_status, "
+                  "source_keys, source_urls, image_media_type, image_hash, image_width, image_data")
+
+def _import_row(record: dict) -> tuple:
+    """COPY row for the research_import staging table"""
+    keys, urls = [], []
+    for source in record.get("sources") or []:
+        if isinstance(source, dict) and source.get("url"):
+            key = freshness.normalize_url(source["url"])
+            if key:
+                keys.append(key)
+                urls.append(source["url"])
+    image = record.get("image") or {}
+    data = image.get("data")
+    return (
+        record.get("id"), record["topic"], record["summary"],
+        json.dumps(record.get("sources") or []), json.dumps(record.get("key_stats") or []),
+        record.get("image_url"), record.get("image_prompt"), record.get("created_at"), record.get("image_status"),
+        keys, urls,
+        (image.get("media_type") or sniff_media_type(data)) if data else None,
+        content_hash(data) if data else None,
+        image_width(data) if data else None,
+        data
+    )
+
+async def import_research(records) -> dict:
+    """Bulk-load research records (an async iterable of export dicts) in one transaction
+
+    Rows are streamed with COPY into a staging table, then inserted in one
+    statement along with their original images and source index entries.
+    Ids are kept; records whose id already exists are skipped, and records
+    without one get a new id. Raises ValueError for malformed data.
+    """
+    try:
+        async with get_connection() as conn:
+            await conn.execute("""
+                CREATE TEMP TABLE research_import (
+                    id INTEGER UNIQUE,
+                    topic VARCHAR(255) NOT NULL,
+                    summary TEXT NOT NULL,
+                    sources JSONB,
+                    key_stats JSONB,
+                    image_url TEXT,
+                    image_prompt TEXT,
+                    created_at TIMESTAMP,
+                    image_status VARCHAR(16),
+                    source_keys TEXT[],
+                    source_urls TEXT[],
+                    image_media_type VARCHAR(64),
+                    image_hash CHAR(64),
+                    image_width INTEGER,
+                    image_data BYTEA
+                ) ON COMMIT DROP
+            """)
+            staged = 0
+            async with conn.cursor() as cur:
+                async with cur.copy(f"COPY research_import ({IMPORT_COLUMNS}) FROM STDIN") as copy:
+                    async for record in records:
+                        await copy.write_row(_import_row(record))
+                        staged += 1
+            
+            await conn.execute("ANALYZE research_import")
+            await conn.execute("""
+                UPDATE research_import SET id = nextval(pg_get_serial_sequence('research_updates', 'id'))
+                WHERE id IS NULL
+            """)
+            # Images only follow rows that were actually inserted; a pending image goes back in the queue
+            cur = await conn.execute("""
+                WITH inserted AS (
+                    INSERT INTO research_updates (id, topic, summary, sources, key_stats, image_url, image_prompt,
+                                                  created_at, image_status, image_next_attempt_at)
+                    SELECT id, topic, summary, COALESCE(sources, '[]'::jsonb), COALESCE(key_stats, '[]'::jsonb),
+                           image_url, image_prompt, COALESCE(created_at, CURRENT_TIMESTAMP),
+                           CASE WHEN image_data IS NOT NULL THEN 'ready'
+                                WHEN image_status IN ('pending', 'generating') THEN 'pending'
+                                WHEN image_status = 'failed' THEN 'failed'
+                                ELSE 'none' END,
+                           NOW()
+                    FROM research_import
+                    ON CONFLICT (id) DO NOTHING
+                    RETURNING id
+                ), images AS (
+                    INSERT INTO research_images (research_id, media_type, byte_size, hash, width, data)
+                    SELECT s.id, s.image_media_type, length(s.image_data), s.image_hash, s.image_width, s.image_data
+                    FROM research_import s JOIN inserted USING (id)
+                    WHERE s.image_data IS NOT NULL
+                    RETURNING 1
+                ), indexed AS (
+                    INSERT INTO research_sources (url_key, url, research_id)
+                    SELECT k.url_key, k.url, s.id
+                    FROM research_import s JOIN inserted USING (id),
+                         unnest(s.source_keys, s.source_urls) AS k(url_key, url)
+                    ON CONFLICT (url_key) DO NOTHING
+                    RETURNING 1
+                )
+                SELECT (SELECT COUNT(*) FROM inserted), (SELECT COUNT(*) FROM images), (SELECT COUNT(*) FROM indexed)
+            """)
+            inserted, images, indexed = await cur.fetchone()
+            # Never move the sequence backwards past ids handed out to concurrent inserts
+            await conn.execute("""
+                SELECT setval('research_updates_id_seq', GREATEST(MAX(id), (SELECT last_value FROM research_updates_id_seq)))
+                FROM research_updates HAVING MAX(id) IS NOT NULL
+            """)
+            await notify_change(conn, "invalidate")
+    except (psycopg.DataError, psycopg.IntegrityError) as e:
+        raise ValueError(f"Invalid import data: {e}") from e
+    invalidate_count()
+    feed_cache.bump_version()
+    return {"staged": staged, "inserted": inserted, "skipped": staged - inserted,
+            "images": images, "sources_indexed": indexed}
+
+async def search_research(query: str, limit: int = 10, after: tuple = None) -> list:
+    """Full-text search of the archive, best match first
+
+    `after` is a (rank, id) keyset cursor: only rows ranked strictly lower are returned.
+    Each result carries its rank and highlighted topic/summary snippets.
+    """
+    where = ""
+    params = [query]
+    if after:
+        where = "AND (ts_rank_cd(r.search_vector, q.query), r.id) < (%s::real, %s)"
+        params.extend(after)
+    params.append(limit)
     
-    deleted = cur.rowcount
-    conn.commit()
-    cur.close()
-    conn.close()
-    return deleted
+    # Rank every GIN match, but only build headlines for the page being returned
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            WITH q AS (
+                SELECT websearch_to_tsquery('{SEARCH_CONFIG}', %s) AS query
+            ), page AS (
+                SELECT r.id, ts_rank_cd(r.search_vector, q.query) AS rank
+                FROM research_updates r, q
+                WHERE r.search_vector @@ q.query
+                {where}
+                ORDER BY rank DESC, r.id DESC
+                LIMIT %s
+            )
+            SELECT r.id, r.topic, r.summary, r.sources, r.key_stats, r.image_url, r.image_prompt,
+                   r.created_at::text, r.image_status, {IMAGE_VERSION_SQL.format('r')}, page.rank,
+                   ts_headline('{SEARCH_CONFIG}', r.topic, q.query, 'HighlightAll=true'),
+                   ts_headline('{SEARCH_CONFIG}', r.summary, q.query, 'MaxWords=35, MinWords=15, MaxFragments=2')
+            FROM page JOIN research_updates r ON r.id = page.id, q
+            ORDER BY page.rank DESC, page.id DESC
+        """, params)
+        rows = await cur.fetchall()
+    
+    return [
+        {**row_to_research(row), "rank": row[10], "highlights": {"topic": row[11], "summary": row[12]}}
+        for row in rows
+    ]
+
+async def get_cached_completion(key: str, ttl_hours: float) -> tuple:
+    """(response, total_tokens) for an unexpired cached completion, or None; marks it recently used"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            UPDATE llm_cache SET last_used_at = NOW()
+            WHERE key = %s AND created_at > NOW() - %s * INTERVAL '1 hour'
+            RETURNING response, total_tokens
+        """, (key, ttl_hours))
+        return await cur.fetchone()
+
+async def store_cached_completion(key: str, model: str, response: str, total_tokens: int):
+    """Save a completion to the cache (replacing any expired entry)"""
+    async with get_connection() as conn:
+        await conn.execute("""
+            INSERT INTO llm_cache (key, model, response, total_tokens)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (key) DO UPDATE SET
+                response = EXCLUDED.response, total_tokens = EXCLUDED.total_tokens,
+                created_at = NOW(), last_used_at = NOW()
+        """, (key, model, response, total_tokens))
+
+async def prune_llm_cache(ttl_hours: float, max_entries: int) -> int:
+    """Delete expired completions, then the least recently used beyond max_entries"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            DELETE FROM llm_cache WHERE created_at <= NOW() - %s * INTERVAL '1 hour'
+        """, (ttl_hours,))
+        deleted = cur.rowcount
+        cur = await conn.execute("""
+            DELETE FROM llm_cache WHERE key IN (
+                SELECT key FROM llm_cache ORDER BY last_used_at DESC OFFSET %s
+            )
+        """, (max_entries,))
+        return deleted + cur.rowcount
+
+JOB_COLUMNS = "id, kind, params, status, stage, stages, result, error, owner, created_at, started_at, finished_at"
+
+def row_to_job(row) -> dict:
+    """Convert a JOB_COLUMNS row to a dict"""
+    def when(value):
+        return value.isoformat(timespec="seconds") if value else None
+    return {
+        "id": row[0],
+        "kind": row[1],
+        "params": row[2],
+        "status": row[3],
+        "stage": row[4],
+        "stages": row[5],
+        "result": row[6],
+        "error": row[7],
+        "worker": row[8],
+        "created_at": when(row[9]),
+        "started_at": when(row[10]),
+        "finished_at": when(row[11])
+    }
+
+async def insert_job(job_id: str, kind: str, params: dict, coalesce_key: str, owner: str) -> tuple:
+    """Record a queued job, unless an identical one is already queued or running anywhere
+
+    Returns (job, created); when not created, `job` is the active one.
+    """
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            INSERT INTO research_jobs (id, kind, params, coalesce_key, status, owner)
+            VALUES (%s, %s, %s::jsonb, %s, 'queued', %s)
+            ON CONFLICT (coalesce_key) WHERE status IN ('queued', 'running') DO NOTHING
+            RETURNING {JOB_COLUMNS}
+        """, (job_id, kind, json.dumps(params, default=str), coalesce_key, owner))
+        row = await cur.fetchone()
+        if row:
+            return row_to_job(row), True
+        cur = await conn.execute(f"""
+            SELECT {JOB_COLUMNS} FROM research_jobs
+            WHERE coalesce_key = %s AND status IN ('queued', 'running')
+        """, (coalesce_key,))
+        row = await cur.fetchone()
+    return (row_to_job(row), False) if row else (None, False)
+
+async def find_active_job(coalesce_key: str) -> dict:
+    """The queued or running job with this coalesce key, or None"""
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT {JOB_COLUMNS} FROM research_jobs
+            WHERE coalesce_key = %s AND status IN ('queued', 'running')
+        """, (coalesce_key,))
+        row = await cur.fetchone()
+    return row_to_job(row) if row else None
+
+async def update_job(job_id: str, version: int, status: str, stage: str, stages: list,
+                     result=None, error: str = None, started: bool = False, finished: bool = False):
+    """Write a job's state; ignored if a newer version was already written"""
+    async with get_connection() as conn:
+        await conn.execute("""
+            UPDATE research_jobs
+            SET version = %s, status = %s, stage = %s, stages = %s::jsonb, result = %s::jsonb, error = %s,
+                started_at = CASE WHEN %s THEN COALESCE(started_at, NOW()) ELSE started_at END,
+                finished_at = CASE WHEN %s THEN NOW() ELSE finished_at END,
+                heartbeat_at = NOW()
+            WHERE id = %s AND version < %s
+        """, (version, status, stage, json.dumps(stages, default=str),
+              None if result is None else json.dumps(result, default=str), error,
+              started, finished, job_id, version))
+
+async def heartbeat_jobs(owner: str, stale_seconds: float) -> int:
+    """Mark `owner`'s active jobs alive, and fail jobs whose worker stopped heartbeating
+
+    Returns how many lost jobs were failed.
+    """
+    async with get_connection() as conn:
+        await conn.execute("""
+            UPDATE research_jobs SET heartbeat_at = NOW()
+            WHERE owner = %s AND status IN ('queued', 'running')
+        """, (owner,))
+        cur = await conn.execute("""
+            UPDATE research_jobs SET status = 'failed', error = 'worker lost', finished_at = NOW()
+            WHERE status IN ('queued', 'running') AND heartbeat_at < NOW() - %s * INTERVAL '1 second'
+        """, (stale_seconds,))
+        return cur.rowcount
+
+async def get_job_record(job_id: str) -> dict:
+    """One job by id, or None"""
+    async with get_connection() as conn:
+        cur = await conn.execute(f"SELECT {JOB_COLUMNS} FROM research_jobs WHERE id = %s", (job_id,))
+        row = await cur.fetchone()
+    return row_to_job(row) if row else None
+
+async def list_job_records(limit: int = 20) -> list:
+    """Most recent jobs, newest first"""
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT {JOB_COLUMNS} FROM research_jobs ORDER BY created_at DESC LIMIT %s
+        """, (limit,))
+        rows = await cur.fetchall()
+    return [row_to_job(row) for row in rows]
+
+async def prune_jobs(keep: int) -> int:
+    """Delete finished jobs beyond the newest `keep` jobs"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            DELETE FROM research_jobs
+            WHERE finished_at IS NOT NULL AND created_at < (
+                SELECT created_at FROM research_jobs ORDER BY created_at DESC OFFSET %s LIMIT 1
+            )
+        """, (keep,))
+        return cur.rowcount
+
+async def acquire_lease(name: str, holder: str, ttl_seconds: float) -> bool:
+    """Take or renew a lease; True if `holder` owns it (it was free, expired, or already ours)"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            INSERT INTO scheduler_state (name, holder, lease_expires_at)
+            VALUES (%s, %s, NOW() + %s * INTERVAL '1 second')
+            ON CONFLICT (name) DO UPDATE SET
+                holder = EXCLUDED.holder, lease_expires_at = EXCLUDED.lease_expires_at
+            WHERE scheduler_state.holder = EXCLUDED.holder
+               OR scheduler_state.holder IS NULL
+               OR scheduler_state.lease_expires_at < NOW()
+            RETURNING holder
+        """, (name, holder, ttl_seconds))
+        return await cur.fetchone() is not None
+
+async def release_lease(name: str, holder: str):
+    """Give up a lease held by `holder`"""
+    async with get_connection() as conn:
+        await conn.execute("""
+            UPDATE scheduler_state SET holder = NULL, lease_expires_at = NULL
+            WHERE name = %s AND holder = %s
+        """, (name, holder))
 
-def get_image_data(research_id: int) -> str:
-    """Get image data (base64) for a specific research entry"""
-    conn = get_connection()
-    cur = conn.cursor()
+async def load_scheduler_state(name: str) -> dict:
+    """Persisted schedule state (check_count, interval_minutes, next_run_at, last_run_at, last_status)"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            SELECT check_count, interval_minutes, next_run_at, last_run_at, last_status
+            FROM scheduler_state WHERE name = %s
+        """, (name,))
+        row = await cur.fetchone()
+    keys = ("check_count", "interval_minutes", "next_run_at", "last_run_at", "last_status")
+    return dict(zip(keys, row)) if row else {}
+
+async def save_scheduler_state(name: str, holder: str, check_count: int, interval_minutes: float,
+                               next_run_at, last_status: str) -> bool:
+    """Record a finished check; only the current lease holder may write (False otherwise)"""
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            UPDATE scheduler_state
+            SET check_count = %s, interval_minutes = %s, next_run_at = %s, last_run_at = NOW(), last_status = %s
+            WHERE name = %s AND holder = %s
+        """, (check_count, interval_minutes, next_run_at, last_status, name, holder))
+        return cur.rowcount > 0
+
+async def schedule_next_run(name: str, holder: str, next_run_at):
+    """Persist when the next check is due (so a new leader keeps the timing)"""
+    async with get_connection() as conn:
+        await conn.execute("""
+            UPDATE scheduler_state SET next_run_at = %s WHERE name = %s AND holder = %s
+        """, (next_run_at, name, holder))
+
+QUERY_STATS_COLUMNS = ("checks", "saved", "not_saved", "not_fresh", "no_results", "alpha", "beta", "last_outcome")
+
+async def load_query_stats() -> dict:
+    """Per-query outcome history: {query: {column: value}}"""
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT query, {", ".join(QUERY_STATS_COLUMNS)}, last_checked_at::text FROM query_stats
+        """)
+        rows = await cur.fetchall()
+    return {row[0]: dict(zip(QUERY_STATS_COLUMNS + ("last_checked_at",), row[1:])) for row in rows}
+
+async def save_query_stats(outcomes: dict, decay: float) -> dict:
+    """Apply each query's outcome to its stored history in SQL; returns the updated records
+
+    Decay and counter increments happen in the UPDATE, so outcomes recorded by different
+    processes accumulate instead of overwriting each other.
+    """
+    counters = QUERY_STATS_COLUMNS[1:5]
+    rows = []
+    for query, outcome in outcomes.items():
+        reward = 1.0 if outcome == "saved" else 0.0
+        rows.append((query, *(int(c == outcome) for c in counters), reward, 1.0 - reward, outcome, decay, decay))
+    if not rows:
+        return {}
+    columns = QUERY_STATS_COLUMNS + ("last_checked_at",)
+    records = {}
+    async with get_connection() as conn:
+        async with conn.cursor() as cur:
+            await cur.executemany(f"""
+                INSERT INTO query_stats (query, {", ".join(QUERY_STATS_COLUMNS)}, last_checked_at)
+                VALUES (%s, 1, {", ".join(["%s"] * (len(QUERY_STATS_COLUMNS) - 1))}, NOW())
+                ON CONFLICT (query) DO UPDATE SET
+                    checks = query_stats.checks + 1,
+                    {", ".join(f"{c} = query_stats.{c} + EXCLUDED.{c}" for c in counters)},
+                    alpha = %s * query_stats.alpha + EXCLUDED.alpha,
+                    beta = %s * query_stats.beta + EXCLUDED.beta,
+                    last_outcome = EXCLUDED.last_outcome,
+                    last_checked_at = NOW()
+                RETURNING query, {", ".join(columns[:-1])}, last_checked_at::text
+            """, rows, returning=True)
+            while True:
+                row = await cur.fetchone()
+                records[row[0]] = dict(zip(columns, row[1:]))
+                if not cur.nextset():
+                    break
+    return records
+
+def row_to_research(row) -> dict:
+    """Convert a RESEARCH_COLUMNS row to a dict"""
+    return {
+        "id": row[0],
+        "topic": row[1],
+        "summary": row[2],
+        "sources": row[3],
+        "key_stats": row[4],
+        "image_url": row[5],
+        "image_prompt": row[6],
+        "created_at": row[7],
+        "image_status": row[8],
+        "image_version": row[9]
+    }
+
+def row_to_compact(row) -> dict:
+    """Convert a COMPACT_COLUMNS row to a dict"""
+    return {
+        "id": row[0],
+        "topic": row[1],
+        "teaser": row[2][:TEASER_CHARS],
+        "truncated": len(row[2]) > TEASER_CHARS,
+        "image_url": row[3],
+        "created_at": row[4],
+        "image_status": row[5],
+        "image_version": row[6]
+    }
+
+async def notify_change(conn, change_type: str, research_id: int = None):
+    """Queue a research_events notification; Postgres sends it on commit"""
+    payload = json.dumps({"type": change_type, "id": research_id})
+    await conn.execute("SELECT pg_notify('research_events', %s)", (payload,))
+
+async def get_research_by_id(research_id: int) -> dict:
+    """Get one research update (without image bytes), or None"""
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT {RESEARCH_COLUMNS}
+            FROM research_updates
+            WHERE id = %s
+        """, (research_id,))
+        row = await cur.fetchone()
+    return row_to_research(row) if row else None
+
+async def get_research_since(after_id: int, limit: int = 50) -> list:
+    """Research updates with id > after_id, oldest first (for SSE resume)"""
+    async with get_connection() as conn:
+        cur = await conn.execute(f"""
+            SELECT {RESEARCH_COLUMNS}
+            FROM research_updates
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (after_id, limit))
+        rows = await cur.fetchall()
+    return [row_to_research(row) for row in rows]
+
+def invalidate_count():
+    """Forget the cached row count after a write"""
+    _count_cache["value"] = None
+
+async def count_research() -> int:
+    """Total number of research updates (cached for COUNT_CACHE_SECONDS, reset on writes)"""
+    now = time.monotonic()
+    if _count_cache["value"] is not None and now - _count_cache["at"] < COUNT_CACHE_SECONDS:
+        return _count_cache["value"]
     
-    cur.execute("""
-        SELECT image_data FROM research_updates WHERE id = %s
-    """, (research_id,))
+    async with get_connection() as conn:
+        cur = await conn.execute("SELECT COUNT(*) FROM research_updates")
+        count = (await cur.fetchone())[0]
+    _count_cache["value"] = count
+    _count_cache["at"] = now
+    return count
+
+async def get_all_topics():
+    """Get all unique topics that have been researched, most recently updated first
+
+    Reads topic_stats (one row per normalized topic), not the research table.
+    """
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            SELECT topic, last_seen::text AS last_updated, research_count, first_seen::text AS first_seen, latest_id
+            FROM topic_stats s
+            ORDER BY s.last_seen DESC, s.latest_id DESC
+        """)
+        rows = await cur.fetchall()
+    
+    return [
+        {"topic": row[0], "last_updated": row[1], "count": row[2], "first_seen": row[3], "latest_id": row[4]}
+        for row in rows
+    ]
+
+async def get_retention_boundary(keep_count: int = None, max_age_days: float = None) -> tuple:
+    """(created_at, id) keyset below which rows are evicted, or None if nothing is
+
+    A row goes if it is beyond the newest `keep_count` or older than `max_age_days`.
+    """
+    boundaries = []
+    async with get_connection() as conn:
+        if keep_count is not None:
+            # Walks idx_research_created_id; the row at position keep_count is the newest one evicted
+            cur = await conn.execute("""
+                SELECT created_at, id FROM research_updates
+                ORDER BY created_at DESC, id DESC
+                OFFSET %s LIMIT 1
+            """, (max(0, keep_count - 1),))
+            row = await cur.fetchone()
+            if row:
+                boundaries.append(tuple(row))
+        if max_age_days:
+            cur = await conn.execute("SELECT (NOW() - %s * INTERVAL '1 day')::timestamp", (max_age_days,))
+            boundaries.append(((await cur.fetchone())[0], 0))  # Ids are positive: "(created_at, id) < (cutoff, 0)"
+    return max(boundaries) if boundaries else None
+
+async def evict_research_batch(before: tuple, limit: int = 50, archive_image=None, archive_segment=None) -> dict:
+    """Delete up to `limit` of the oldest rows with (created_at, id) < `before`, in one transaction
+
+    With archiving, `archive_image(hash, media_type, data)` is awaited for each
+    original image and `archive_segment(records)` for the batch before anything is
+    deleted; if either raises, the batch is left in place. Returns the evicted ids
+    and the bytes they took up (row plus every image variant).
+    """
+    async with get_connection() as conn:
+        # Qualified ORDER BY: the created_at::text alias would force a full scan and sort per batch
+        cur = await conn.execute(f"""
+            SELECT {RESEARCH_COLUMNS}, pg_column_size(research_updates.*)
+            FROM research_updates
+            WHERE (created_at, id) < (%s, %s)
+            ORDER BY research_updates.created_at, research_updates.id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+        """, (*before, limit))
+        rows = await cur.fetchall()
+        if not rows:
+            return {"ids": [], "bytes": 0, "image_bytes_archived": 0}
+        ids = [row[0] for row in rows]
+        
+        cur = await conn.execute("""
+            SELECT research_id, variant, media_type, hash, byte_size FROM research_images
+            WHERE research_id = ANY(%s)
+        """, (ids,))
+        images = await cur.fetchall()
+        reclaimed = sum(row[10] for row in rows) + sum(image[4] for image in images)
+        
+        archived_bytes = 0
+        if archive_segment:
+            originals = {image[0]: image for image in images if image[1] == "original"}
+            records = []
+            for row in rows:
+                record = row_to_research(row)
+                original = originals.get(record["id"])
+                if original and archive_image:
+                    # One blob in memory at a time
+                    cur = await conn.execute("""
+                        SELECT data FROM research_images WHERE research_id = %s AND variant = 'original'
+                    """, (record["id"],), binary=True)
+                    data = (await cur.fetchone())[0]
+                    record["image"] = {
+                        "hash": original[3].strip(),
+                        "media_type": original[2],
+                        "path": await archive_image(original[3].strip(), original[2], data)
+                    }
+                    archived_bytes += original[4]
+                records.append(record)
+            await archive_segment(records)
+        
+        await conn.execute("DELETE FROM research_updates WHERE id = ANY(%s)", (ids,))
+        await notify_change(conn, "invalidate")
+    invalidate_count()
+    feed_cache.bump_version()
+    return {"ids": ids, "bytes": reclaimed, "image_bytes_archived": archived_bytes}
+
+async def clear_all_research():
+    """Delete ALL research entries - use with caution"""
+    async with get_connection() as conn:
+        cur = await conn.execute("DELETE FROM research_updates")
+        deleted = cur.rowcount
+        await notify_change(conn, "invalidate")
+    invalidate_count()
+    feed_cache.bump_version()
+    return deleted
+
+async def get_image_data(research_id: int, variant: str = "original") -> dict:
+    """Get raw image bytes and metadata for a specific research entry"""
+    async with get_connection() as conn:
+        # Binary transfer avoids hex-encoding the bytea on the wire
+        cur = await conn.execute("""
+            SELECT data, media_type, hash FROM research_images
+            WHERE research_id = %s AND variant = %s
+        """, (research_id, variant), binary=True)
+        row = await cur.fetchone()
     
-    row = cur.fetchone()
-    cur.close()
-    conn.close()
+    if not row:
+        return None
+    return {"data": row[0], "media_type": row[1], "hash": row[2]}
+
+async def get_best_image(research_id: int, width: int = None, media_types: list = None) -> dict:
+    """Pick the smallest stored image that is at least `width` wide (else the largest),
+    preferring `media_types` in order; the original is always a candidate.
+
+    Without a width, the full-size image is served in the best accepted format.
+    "version" is the record's image_version (see IMAGE_VERSION_SQL).
+    """
+    media_types = list(media_types or [])
+    async with get_connection() as conn:
+        cur = await conn.execute("""
+            WITH candidates AS (
+                SELECT data, media_type, hash, variant, COALESCE(width, 2147483647) AS w
+                FROM research_images
+                WHERE research_id = %(id)s AND (variant = 'original' OR media_type = ANY(%(types)s))
+            ), target AS (
+                SELECT COALESCE(%(width)s::int, MAX(w) FILTER (WHERE variant = 'original'), 0) AS width
+                FROM candidates
+            )
+            SELECT data, media_type, hash, variant,
+                   (SELECT left(md5(string_agg(hash, ',' ORDER BY variant)), 16)
+                    FROM research_images WHERE research_id = %(id)s)
+            FROM candidates, target
+            ORDER BY
+                w >= target.width DESC,
+                CASE WHEN w >= target.width THEN w ELSE -w END,
+                COALESCE(array_position(%(types)s::text[], media_type::text), 2147483647)
+            LIMIT 1
+        """, {"id": research_id, "types": media_types, "width": width}, binary=True)
+        row = await cur.fetchone()
     
-    return row[0] if row else None
+    if not row:
+        return None
+    return {"data": row[0], "media_type": row[1], "hash": row[2], "variant": row[3], "version": row[4]}
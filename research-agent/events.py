@@ -0,0 +1,147 @@
+import os
+import json
+import asyncio
+import psycopg
+import feed_cache
+from images import forget_etags
+from database import DATABASE_URL, get_research_by_id, get_research_since, invalidate_count
+
+# Postgres channel carrying research changes; every worker LISTENs on it
+EVENTS_CHANNEL = "research_events"
+SSE_HEARTBEAT_SECONDS = float(os.environ.get("SSE_HEARTBEAT_SECONDS", "15"))
+SSE_MAX_CLIENTS = int(os.environ.get("SSE_MAX_CLIENTS", "5000"))
+SSE_CLIENT_BUFFER = 100  # Events queued per client before it is considered too slow
+SSE_RETRY_MS = 5000  # Client reconnect delay hint
+SSE_REPLAY_BATCH = 50  # Missed records fetched per query when a client resumes
+
+subscribers = set()
+_listener = None
+
+def subscribe() -> asyncio.Queue:
+    """Register a client queue for pushed events"""
+    if len(subscribers) >= SSE_MAX_CLIENTS:
+        return None
+    queue = asyncio.Queue(maxsize=SSE_CLIENT_BUFFER)
+    subscribers.add(queue)
+    return queue
+
+def unsubscribe(queue: asyncio.Queue):
+    subscribers.discard(queue)
+
+def publish(event: dict):
+    """Fan an event out to every connected client of this worker"""
+    for queue in list(subscribers):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Client stopped reading; drop it and let EventSource reconnect with Last-Event-ID
+            unsubscribe(queue)
+
+def format_event(event_id, event_type: str, data: dict) -> str:
+    """Encode one Server-Sent Event"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+def research_event(record: dict, event_type: str = "research") -> dict:
+    """Event for a saved research record (metadata only; the image is fetched by URL)
+
+    "research" events announce new records; "image" events announce that a
+    record's image_status changed.
+    """
+    return {
+        "id": record["id"],
+        "type": event_type,
+        "data": {**record, "image_path": f"/api/research/{record['id']}/image"}
+    }
+
+async def stream_events(queue: asyncio.Queue, last_event_id: int = None):
+    """Async generator of SSE text for one client: replay after Last-Event-ID, then live events"""
+    try:
+        yield f"retry: {SSE_RETRY_MS}\n\n"
+        last_sent = last_event_id or 0
+        if last_event_id:
+            # Page through everything missed; live events only move forward from last_sent
+            while True:
+                records = await get_research_since(last_sent, limit=SSE_REPLAY_BATCH)
+                for record in records:
+                    yield format_event(record["id"], "research", research_event(record)["data"])
+                    last_sent = max(last_sent, record["id"])
+                if len(records) < SSE_REPLAY_BATCH:
+                    break
+        
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if queue not in subscribers:
+                    return  # Dropped as too slow; the client reconnects and resumes
+                yield ": heartbeat\n\n"
+                continue
+            if event["type"] != "research":
+                # Updates to existing records don't move the resume position
+                yield format_event(None, event["type"], event["data"])
+                continue
+            if event["id"] <= last_sent:
+                continue  # Already sent during replay
+            last_sent = event["id"]
+            yield format_event(event["id"], event["type"], event["data"])
+    finally:
+        unsubscribe(queue)
+
+async def _handle_notification(payload: str):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        return
+
+    # Any change (from any worker) invalidates this worker's feed cache
+    feed_cache.bump_version()
+    # ...and its cached row count when rows were added or removed
+    if message.get("type") in ("research", "invalidate"):
+        invalidate_count()
+    # ...and image ETags it may still answer 304s with
+    if message.get("type") in ("image", "variants") and message.get("id"):
+        forget_etags([message["id"]])
+    elif message.get("type") == "invalidate":
+        forget_etags()
+
+    if message.get("type") in ("research", "image") and message.get("id"):
+        record = await get_research_by_id(message["id"])
+        if record:
+            publish(research_event(record, message["type"]))
+
+async def _listen_forever():
+    """Hold one LISTEN connection per worker and fan notifications out to SSE clients"""
+    delay = 1.0
+    while True:
+        try:
+            async with await psycopg.AsyncConnection.connect(DATABASE_URL, autocommit=True) as conn:
+                await conn.execute(f"LISTEN {EVENTS_CHANNEL}")
+                print(f"Listening for research events on '{EVENTS_CHANNEL}'")
+                delay = 1.0
+                async for notify in conn.notifies():
+                    await _handle_notification(notify.payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Event listener error: {e} (reconnecting in {delay:.0f}s)")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 60.0)
+
+def start_listener():
+    """Start the notification listener (called once at startup)"""
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen_forever())
+
+async def stop_listener():
+    """Stop the notification listener (called once at shutdown)"""
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
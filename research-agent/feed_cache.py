@@ -0,0 +1,53 @@
+import os
+import time
+import hashlib
+
+# Max age of a cached response; a safety net for writes made by other workers
+FEED_CACHE_TTL = float(os.environ.get("FEED_CACHE_TTL", "60"))
+FEED_CACHE_MAX_ENTRIES = int(os.environ.get("FEED_CACHE_MAX_ENTRIES", "500"))
+
+# Bumped by every write that changes what the feed endpoints return
+version = 0
+_entries = {}  # request key -> {"version", "stored_at", "body", "etag"}
+stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+def bump_version():
+    """Invalidate all cached feed responses (called after research is saved or deleted)"""
+    global version
+    version += 1
+    stats["invalidations"] += 1
+    _entries.clear()
+
+def lookup(key: str) -> dict:
+    """Cached entry for a request key, or None if missing, stale or from an older version"""
+    entry = _entries.get(key)
+    if entry is not None and (entry["version"] != version or time.monotonic() - entry["stored_at"] > FEED_CACHE_TTL):
+        _entries.pop(key, None)
+        entry = None
+    stats["hits" if entry else "misses"] += 1
+    return entry
+
+def store(key: str, body: bytes, at_version: int) -> dict:
+    """Cache a rendered JSON body built while `version` was `at_version`"""
+    entry = {
+        "version": at_version,
+        "stored_at": time.monotonic(),
+        "body": body,
+        "etag": f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+    }
+    # A write that landed while the body was being built makes it stale already
+    if at_version == version:
+        _entries[key] = entry
+        while len(_entries) > FEED_CACHE_MAX_ENTRIES:
+            del _entries[next(iter(_entries))]  # Oldest first (dicts keep insertion order)
+    return entry
+
+def get_stats() -> dict:
+    """Hit/miss counters for the stats endpoint"""
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+        "entries": len(_entries),
+        "version": version
+    }
@@ -0,0 +1,196 @@
+import os
+import re
+import random
+import struct
+import hashlib
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+# Near-duplicate detection: MinHash signatures over content words, LSH-banded.
+# Texts whose estimated Jaccard similarity reaches MINHASH_THRESHOLD count as
+# the same story. Bands x rows = permutations; 16 bands of 4 rows put the
+# LSH candidate cut-off near 0.5 similarity.
+MINHASH_THRESHOLD = float(os.environ.get("MINHASH_THRESHOLD", "0.5"))
+MINHASH_PERMUTATIONS = 64
+MINHASH_BANDS = int(os.environ.get("MINHASH_BANDS", "16"))
+# Looser cut-off for grouping different outlets' coverage of one story. Search snippets are
+# short and outlets word them differently: same-story pairs score roughly 0.1-0.3, while
+# different stories on the same beat reach ~0.1, so grouping stays best-effort
+STORY_CLUSTER_THRESHOLD = float(os.environ.get("STORY_CLUSTER_THRESHOLD", "0.15"))
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)  # Fixed seed: signatures are persisted and must stay comparable
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+                 for _ in range(MINHASH_PERMUTATIONS)]
+
+STOPWORDS = set("""a an the and or but of to in on at for with as by from is are was were be been
+being it its this that these those has have had will would can could may might said says say
+after over into about than more most their there they them he she his her we our you your
+not no new also just who what when where which while how all any some such""".split())
+
+# Query parameters that only track the click, never change the story
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "igshid", "mc_cid", "mc_eid",
+    "ref", "ref_src", "ref_url", "cmpid", "cmp", "ocid", "smid", "sr_share",
+    "guccounter", "guce_referrer", "guce_referrer_sig", "_ga", "_gl",
+}
+TRACKING_PREFIXES = ("utm_", "at_", "pk_")
+
+# Normalized keys of every source URL ever saved (mirrors the research_sources table)
+known_urls = set()
+
+# MinHash signatures of saved search results and summaries (mirrors research_fingerprints)
+_bands = [{} for _ in range(MINHASH_BANDS)]  # band key -> set of (signature, research_id, kind)
+stats = {"near_duplicates": 0, "llm_calls_saved": 0, "image_calls_saved": 0}
+
+def normalize_url(url: str) -> str:
+    """Canonical key for a source URL.
+
+    Scheme and www. are dropped, host is lowercased, default ports, fragments,
+    tracking parameters and trailing slashes are removed, and the remaining
+    query parameters are sorted.
+    """
+    if not url:
+        return ""
+    url = url.strip()
+    if "://" not in url:
+        url = "http://" + url
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").lower()
+        port = parts.port
+    except ValueError:
+        return url.lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+
+    path = parts.path.rstrip("/") or ""
+    query = [
+        (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+        if k.lower() not in TRACKING_PARAMS and not k.lower().startswith(TRACKING_PREFIXES)
+    ]
+    key = host + path
+    if query:
+        key += "?" + urlencode(sorted(query))
+    return key
+
+def source_keys(sources: list) -> list:
+    """Normalized keys for a list of source dicts / search results (unique, order kept)"""
+    keys = []
+    for source in sources or []:
+        if isinstance(source, dict):
+            key = normalize_url(source.get("url", ""))
+            if key and key not in keys:
+                keys.append(key)
+    return keys
+
+def load_known(keys):
+    """Replace the in-memory index with keys loaded from the database"""
+    known_urls.clear()
+    known_urls.update(keys)
+
+def remember(keys):
+    """Add newly saved source keys to the in-memory index"""
+    known_urls.update(keys)
+
+def unknown(keys: list) -> list:
+    """Keys not in the in-memory index"""
+    return [k for k in keys if k not in known_urls]
+
+def tokenize(text: str) -> set:
+    """Distinct content words of a text (stopwords dropped)"""
+    return {t for t in re.findall(r"[a-z0-9]+", (text or "").lower()) if t not in STOPWORDS}
+
+def minhash(text: str) -> tuple:
+    """MinHash signature (MINHASH_PERMUTATIONS values) of a text's content words"""
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    hashes = [int.from_bytes(hashlib.blake2b(t.encode(), digest_size=8).digest(), "big") for t in tokens]
+    return tuple(min((a * h + b) % _MERSENNE_PRIME for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS)
+
+def result_text(result: dict) -> str:
+    """Text of a search result used for its signature"""
+    return f"{result.get('title', '')} {result.get('content', '')}"
+
+def signature_to_bytes(signature: tuple) -> bytes:
+    """Pack a signature for the research_fingerprints.signature column"""
+    return struct.pack(f"<{len(signature)}I", *signature)
+
+def signature_from_bytes(data: bytes) -> tuple:
+    return struct.unpack(f"<{len(data) // 4}I", data)
+
+def similarity(a: tuple, b: tuple) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+def _band_keys(signature: tuple):
+    rows = MINHASH_PERMUTATIONS // MINHASH_BANDS
+    return [hash(signature[i * rows:(i + 1) * rows]) for i in range(MINHASH_BANDS)]
+
+def add_signature(research_id: int, kind: str, signature: tuple):
+    """Add a signature to the in-memory LSH index"""
+    if not signature or len(signature) != MINHASH_PERMUTATIONS:
+        return
+    entry = (signature, research_id, kind)
+    for band, key in zip(_bands, _band_keys(signature)):
+        band.setdefault(key, set()).add(entry)
+
+def load_signatures(rows) -> int:
+    """Replace the in-memory LSH index with (research_id, kind, signature bytes) rows"""
+    for band in _bands:
+        band.clear()
+    count = 0
+    for research_id, kind, data in rows:
+        add_signature(research_id, kind, signature_from_bytes(data))
+        count += 1
+    return count
+
+def find_near_duplicate(signature: tuple, kinds: tuple = None, threshold: float = None):
+    """Most similar indexed entry at or above `threshold`: (research_id, kind, similarity) or None
+
+    Only entries sharing at least one LSH band are compared.
+    """
+    if not signature:
+        return None
+    threshold = MINHASH_THRESHOLD if threshold is None else threshold
+    best = None
+    seen = set()
+    for band, key in zip(_bands, _band_keys(signature)):
+        for entry in band.get(key, ()):
+            if entry in seen or (kinds and entry[2] not in kinds):
+                continue
+            seen.add(entry)
+            score = similarity(signature, entry[0])
+            if score >= threshold and (best is None or score > best[2]):
+                best = (entry[1], entry[2], round(score, 3))
+    return best
+
+def cluster(signatures: list, threshold: float = None) -> list:
+    """Group signatures into stories, largest first
+
+    Each signature joins the first story whose lead (first member) it matches
+    at `threshold`, so loosely related texts can't chain stories together.
+    Returns lists of indices into `signatures`; missing signatures stay on their own.
+    """
+    threshold = STORY_CLUSTER_THRESHOLD if threshold is None else threshold
+    stories = []
+    for i, signature in enumerate(signatures):
+        for story in stories:
+            lead = signatures[story[0]]
+            if signature and lead and similarity(signature, lead) >= threshold:
+                story.append(i)
+                break
+        else:
+            stories.append([i])
+    return sorted(stories, key=len, reverse=True)
+
+def get_stats() -> dict:
+    """Near-duplicate counters for the stats endpoint"""
+    return {
+        **stats,
+        "signatures": len({e for band in _bands for entries in band.values() for e in entries}),
+        "threshold": MINHASH_THRESHOLD,
+        "known_urls": len(known_urls)
+    }
@@ -0,0 +1,71 @@
+import os
+import asyncio
+from database import claim_image_job, fail_image_job
+
+# Image generation runs in the background after the text is saved. Workers are per process;
+# their image calls share the deployment-wide OPENAI_IMAGES_RPM budget (see upstream.py)
+IMAGE_WORKERS = int(os.environ.get("IMAGE_WORKERS", "1"))
+# How often idle workers look for queued images (saves in this process wake them immediately)
+IMAGE_QUEUE_POLL_SECONDS = float(os.environ.get("IMAGE_QUEUE_POLL_SECONDS", "15"))
+
+stats = {"attached": 0, "retried": 0, "failed": 0}
+_wakeup = None
+_workers = []
+
+def wake():
+    """Tell idle workers there is a newly queued image"""
+    if _wakeup is not None:
+        _wakeup.set()
+
+async def _idle():
+    try:
+        await asyncio.wait_for(_wakeup.wait(), timeout=IMAGE_QUEUE_POLL_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+    _wakeup.clear()
+
+async def _worker(n: int, process):
+    while True:
+        try:
+            job = await claim_image_job()
+        except Exception as e:
+            print(f"[image worker {n}] queue error: {e}")
+            job = None
+        if job is None:
+            await _idle()
+            continue
+
+        try:
+            await process(job)
+            stats["attached"] += 1
+        except asyncio.CancelledError:
+            raise  # The claim expires and another worker picks the image up
+        except Exception as e:
+            try:
+                status = await fail_image_job(job["id"], str(e))
+            except Exception as db_error:
+                print(f"[image worker {n}] could not record failure: {db_error}")
+                continue
+            stats["failed" if status == "failed" else "retried"] += 1
+            print(f"[image worker {n}] research {job['id']} attempt {job['attempts']}: {e} ({status})")
+
+def start_image_workers(process):
+    """Start the image workers (called once at startup); `process` generates and attaches one job's image"""
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    for n in range(IMAGE_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n, process)))
+    print(f"Image workers: {IMAGE_WORKERS}")
+
+async def stop_image_workers():
+    """Cancel the image workers (called once at shutdown)"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+
+def get_stats() -> dict:
+    """Image queue counters for the stats endpoint"""
+    return {**stats, "workers": len(_workers)}
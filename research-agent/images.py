@@ -0,0 +1,143 @@
+import os
+import io
+import hashlib
+from collections import OrderedDict
+from PIL import Image, features
+
+# One year, only for URLs pinned to a record's image_version (?v=): those bytes never change
+IMAGE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Plain image URLs change content when an image is attached or variants are backfilled,
+# so browsers revalidate them (a cheap 304 while the ETag still matches)
+IMAGE_REVALIDATE_CACHE_CONTROL = "public, no-cache"
+IMAGE_ETAG_CACHE_SIZE = int(os.environ.get("IMAGE_ETAG_CACHE_SIZE", "10000"))
+
+# Variants generated at ingest time: widths (clamped to the original) x formats
+VARIANT_WIDTHS = [int(w) for w in os.environ.get("IMAGE_VARIANT_WIDTHS", "480,960,1792").split(",") if w.strip()]
+VARIANT_FORMATS = [f.strip() for f in os.environ.get("IMAGE_VARIANT_FORMATS", "webp,avif").split(",") if f.strip()]
+VARIANT_QUALITY = int(os.environ.get("IMAGE_VARIANT_QUALITY", "70"))
+
+# Smallest first; used to break ties between variants of the same width
+FORMAT_MEDIA_TYPES = {"avif": "image/avif", "webp": "image/webp"}
+
+# (research_id, variant selection) -> ETag, so conditional requests can be answered without the database
+_etags = OrderedDict()
+
+def content_hash(data: bytes) -> str:
+    """Content address for image bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+def sniff_media_type(data: bytes) -> str:
+    """Guess an image media type from its magic bytes"""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    return "application/octet-stream"
+
+def make_etag(image_hash: str) -> str:
+    """Strong ETag for an image hash"""
+    return f'"{image_hash}"'
+
+def remember_etag(research_id: int, variant: str, etag: str):
+    """Cache the ETag served for an image (bounded LRU)"""
+    key = (research_id, variant)
+    _etags[key] = etag
+    _etags.move_to_end(key)
+    while len(_etags) > IMAGE_ETAG_CACHE_SIZE:
+        _etags.popitem(last=False)
+
+def known_etag(research_id: int, variant: str) -> str:
+    """ETag previously served for an image, or None"""
+    return _etags.get((research_id, variant))
+
+def forget_etags(research_ids=None):
+    """Drop cached ETags for deleted or re-imaged records (all of them if research_ids is None)"""
+    if research_ids is None:
+        _etags.clear()
+        return
+    ids = set(research_ids)
+    for key in [k for k in _etags if k[0] in ids]:
+        del _etags[key]
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Whether an If-None-Match header value matches an ETag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+def parse_range(range_header: str, size: int):
+    """Parse a single `bytes=` range into (start, end) inclusive.
+
+    Returns None when there is no usable range (serve the whole body) and
+    raises ValueError when the range cannot be satisfied (416).
+    """
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].strip()
+    if "," in spec:
+        return None  # Multipart ranges are not supported; send the full image
+    start_s, _, end_s = spec.partition("-")
+    try:
+        if start_s == "":
+            suffix = int(end_s)
+            start = max(0, size - suffix) if suffix > 0 else size
+            end = size - 1
+        else:
+            start = int(start_s)
+            end = int(end_s) if end_s else size - 1
+    except ValueError:
+        return None  # Malformed ranges are ignored
+    end = min(end, size - 1)
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+def supported_formats() -> list:
+    """Configured variant formats this Pillow build can encode"""
+    return [f for f in VARIANT_FORMATS if f in FORMAT_MEDIA_TYPES and features.check(f)]
+
+def image_width(data: bytes) -> int:
+    """Pixel width of encoded image bytes (None if they can't be decoded)"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            return img.width
+    except Exception:
+        return None
+
+def build_variants(data: bytes) -> list:
+    """Resize/re-encode an original image into the preset variants.
+
+    CPU-bound; run it off the event loop. Returns a list of dicts with
+    variant, media_type, width and data.
+    """
+    variants = []
+    with Image.open(io.BytesIO(data)) as img:
+        img.load()
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGB")
+        widths = sorted({min(w, img.width) for w in VARIANT_WIDTHS})
+        for width in widths:
+            height = max(1, round(img.height * width / img.width))
+            resized = img if width == img.width else img.resize((width, height), Image.LANCZOS)
+            for fmt in supported_formats():
+                out = io.BytesIO()
+                resized.save(out, format=fmt.upper(), quality=VARIANT_QUALITY)
+                variants.append({
+                    "variant": f"w{width}.{fmt}",
+                    "media_type": FORMAT_MEDIA_TYPES[fmt],
+                    "width": width,
+                    "data": out.getvalue()
+                })
+    return variants
+
+def accepted_media_types(accept: str) -> list:
+    """Variant media types the client accepts, in preference order (smallest first)"""
+    accept = (accept or "").lower()
+    return [mt for mt in FORMAT_MEDIA_TYPES.values() if mt in accept]
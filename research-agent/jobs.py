@@ -0,0 +1,150 @@
+import os
+import json
+import uuid
+import asyncio
+from datetime import datetime
+from database import insert_job, find_active_job, update_job, heartbeat_jobs, get_job_record, list_job_records, prune_jobs
+from leader import INSTANCE_ID
+
+# Worker pool settings
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_SIZE = int(os.environ.get("JOB_QUEUE_SIZE", "20"))
+JOB_HISTORY_SIZE = int(os.environ.get("JOB_HISTORY_SIZE", "200"))
+# Job state lives in research_jobs so every worker process can report on any job. A job runs
+# in the process that accepted it, which heartbeats it; jobs of a process that stops
+# heartbeating for JOB_STALE_SECONDS are failed so an identical job can be submitted again.
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = float(os.environ.get("JOB_STALE_SECONDS", "120"))
+
+class QueueFullError(Exception):
+    """Raised when the job queue has no room for another job"""
+
+jobs = {}  # job id -> job dict, for jobs queued or running in this process
+_runners = {}  # job id -> coroutine factory taking a progress callback
+_writes = set()  # in-flight state writes, so they aren't garbage collected
+_queue = None
+_reserved = 0  # queue slots held by submissions still inserting their row
+_workers = []
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+def coalesce_key(kind: str, params: dict) -> str:
+    """Identity of a job: same kind and parameters"""
+    return json.dumps([kind, sorted(params.items())], default=str)
+
+async def _save(job: dict, started: bool = False, finished: bool = False):
+    """Write a local job's state; each write carries a higher version so a late one can't undo a newer one"""
+    job["_version"] += 1
+    try:
+        await update_job(job["id"], job["_version"], job["status"], job["stage"], job["stages"],
+                         result=job["result"], error=job["error"], started=started, finished=finished)
+    except Exception as e:
+        print(f"[job {job['id']}] could not save state: {e}")
+
+async def submit_job(kind: str, params: dict, runner) -> tuple[dict, bool]:
+    """Enqueue a job, or return the identical queued/running one (from any worker process).
+
+    `runner` is called with a progress callback and must return an awaitable
+    producing the job result. Returns (job, coalesced).
+    """
+    global _reserved
+    key = coalesce_key(kind, params)
+    if _queue is None or _queue.qsize() + _reserved >= JOB_QUEUE_SIZE:
+        active = await find_active_job(key)
+        if active:
+            return active, True
+        raise QueueFullError("Job queue is full, try again later")
+
+    # Hold the queue slot across the insert, so a concurrent submit can't take it first
+    _reserved += 1
+    try:
+        job, created = await insert_job(uuid.uuid4().hex[:12], kind, params, key, INSTANCE_ID)
+        if not created:
+            if job is None:
+                raise QueueFullError("Job was submitted concurrently, try again")
+            return job, True
+        jobs[job["id"]] = {**job, "_version": 0}
+        _runners[job["id"]] = runner
+        _queue.put_nowait(job["id"])
+    finally:
+        _reserved -= 1
+    try:
+        await prune_jobs(JOB_HISTORY_SIZE)
+    except Exception as e:
+        print(f"Could not prune job history: {e}")
+    return job, False
+
+async def get_job(job_id: str) -> dict:
+    """Get a job's current state, or None if unknown"""
+    return await get_job_record(job_id)
+
+async def list_jobs(limit: int = 20) -> list:
+    """Most recent jobs, newest first"""
+    return await list_job_records(limit)
+
+def _make_progress(job: dict):
+    """Progress callback recording each pipeline stage on the job"""
+    def progress(stage: str, **details):
+        job["stage"] = stage
+        job["stages"].append({"stage": stage, "at": _now(), **details})
+        task = asyncio.ensure_future(_save(job))
+        _writes.add(task)
+        task.add_done_callback(_writes.discard)
+    return progress
+
+async def _worker(n: int):
+    while True:
+        job_id = await _queue.get()
+        job = jobs.get(job_id)
+        runner = _runners.pop(job_id, None)
+        if job is None or runner is None:
+            _queue.task_done()
+            continue
+
+        job["status"] = "running"
+        await _save(job, started=True)
+        print(f"[job {job_id}] worker {n} running {job['kind']} {job['params']}")
+        try:
+            job["result"] = await runner(_make_progress(job))
+            job["status"] = "completed"
+        except asyncio.CancelledError:
+            job["status"] = "failed"
+            job["error"] = "cancelled"
+            raise
+        except Exception as e:
+            print(f"[job {job_id}] failed: {e}")
+            job["status"] = "failed"
+            job["error"] = str(e)
+        finally:
+            await _save(job, finished=True)
+            jobs.pop(job_id, None)
+            _queue.task_done()
+
+async def _heartbeat():
+    while True:
+        try:
+            lost = await heartbeat_jobs(INSTANCE_ID, JOB_STALE_SECONDS)
+            if lost:
+                print(f"Failed {lost} jobs whose worker stopped responding")
+        except Exception as e:
+            print(f"Job heartbeat error: {e}")
+        await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+
+def start_workers():
+    """Start the bounded worker pool (called once at startup)"""
+    global _queue
+    if _workers:
+        return
+    _queue = asyncio.Queue(maxsize=JOB_QUEUE_SIZE)
+    for n in range(JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(n)))
+    _workers.append(asyncio.create_task(_heartbeat()))
+    print(f"Job workers: {JOB_WORKERS} (queue size {JOB_QUEUE_SIZE})")
+
+async def stop_workers():
+    """Cancel the worker pool (called once at shutdown)"""
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
@@ -0,0 +1,86 @@
+import os
+import uuid
+import socket
+import asyncio
+from database import acquire_lease, release_lease
+
+# Exactly one process cluster-wide runs the ingestion schedule; it holds a lease row in
+# scheduler_state and renews it. If it stops renewing, another process takes over.
+LEADER_LEASE_NAME = "ingestion"
+LEADER_LEASE_SECONDS = float(os.environ.get("LEADER_LEASE_SECONDS", "30"))
+LEADER_RENEW_SECONDS = float(os.environ.get("LEADER_RENEW_SECONDS", "10"))
+
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+is_leader = False
+_campaign = None
+stats = {"elected": 0, "demoted": 0, "renew_errors": 0, "election_errors": 0}
+
+async def _call(callback, name: str) -> bool:
+    """Run a leadership callback; False if it raised"""
+    try:
+        await callback()
+        return True
+    except Exception as e:
+        print(f"Leader {name} callback error: {e}")
+        return False
+
+async def _run(on_elected, on_demoted):
+    global is_leader
+    while True:
+        try:
+            held = await acquire_lease(LEADER_LEASE_NAME, INSTANCE_ID, LEADER_LEASE_SECONDS)
+        except Exception as e:
+            # Can't confirm the lease: step down rather than risk two leaders
+            stats["renew_errors"] += 1
+            print(f"Leader lease error: {e}")
+            held = False
+        if held and not is_leader:
+            is_leader = True
+            stats["elected"] += 1
+            print(f"Elected scheduler leader ({INSTANCE_ID})")
+            if not await _call(on_elected, "elected"):
+                # Holding the lease without a schedule would stop ingestion cluster-wide:
+                # undo what was set up, give the lease back and retry next cycle
+                stats["election_errors"] += 1
+                is_leader = False
+                await _call(on_demoted, "demoted")
+                try:
+                    await release_lease(LEADER_LEASE_NAME, INSTANCE_ID)
+                except Exception as e:
+                    print(f"Could not release leader lease: {e}")
+        elif not held and is_leader:
+            is_leader = False
+            stats["demoted"] += 1
+            print(f"Lost scheduler leadership ({INSTANCE_ID})")
+            await _call(on_demoted, "demoted")
+        await asyncio.sleep(LEADER_RENEW_SECONDS)
+
+def start_election(on_elected, on_demoted):
+    """Campaign for the ingestion lease (called once at startup)
+
+    `on_elected` / `on_demoted` are async callbacks run when this process
+    gains or loses leadership.
+    """
+    global _campaign
+    if _campaign is None:
+        _campaign = asyncio.create_task(_run(on_elected, on_demoted))
+
+async def stop_election(on_demoted):
+    """Stop campaigning and hand the lease back so another process takes over at once"""
+    global _campaign, is_leader
+    if _campaign is not None:
+        _campaign.cancel()
+        await asyncio.gather(_campaign, return_exceptions=True)
+        _campaign = None
+    if is_leader:
+        is_leader = False
+        await _call(on_demoted, "demoted")
+        try:
+            await release_lease(LEADER_LEASE_NAME, INSTANCE_ID)
+        except Exception as e:
+            print(f"Could not release leader lease: {e}")
+
+def get_stats() -> dict:
+    """Leadership state for the stats endpoint"""
+    return {"instance": INSTANCE_ID, "is_leader": is_leader, "lease_seconds": LEADER_LEASE_SECONDS, **stats}
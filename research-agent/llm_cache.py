@@ -0,0 +1,35 @@
+import os
+import json
+import hashlib
+
+# Chat completions are cached in Postgres (llm_cache table) for this long
+LLM_CACHE_TTL_HOURS = float(os.environ.get("LLM_CACHE_TTL_HOURS", "24"))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "5000"))
+# Expired and least recently used rows are pruned once every N stores
+LLM_CACHE_PRUNE_EVERY = 100
+
+stats = {"hits": 0, "misses": 0, "bypassed": 0, "stores": 0, "tokens_saved": 0}
+
+def cache_key(model: str, messages: list, temperature: float, max_tokens: int) -> str:
+    """Stable hash of everything that determines a completion"""
+    payload = json.dumps([model, messages, temperature, max_tokens], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def record_hit(tokens: int):
+    stats["hits"] += 1
+    stats["tokens_saved"] += tokens or 0
+
+def record_store() -> bool:
+    """Count a stored completion; True when it's time to prune the table"""
+    stats["stores"] += 1
+    return stats["stores"] % LLM_CACHE_PRUNE_EVERY == 0
+
+def get_stats() -> dict:
+    """Hit/miss counters for the stats endpoint"""
+    lookups = stats["hits"] + stats["misses"]
+    return {
+        **stats,
+        "hit_rate": round(stats["hits"] / lookups, 3) if lookups else None,
+        "ttl_hours": LLM_CACHE_TTL_HOURS,
+        "max_entries": LLM_CACHE_MAX_ENTRIES
+    }
@@ -1,55 +1,137 @@
 import os
+import json
 import base64
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import Response
+from fastapi import FastAPI, HTTPException, Query, Header, Request
+from fastapi.responses import Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from apscheduler.schedulers.background import BackgroundScheduler
-from database import init_db, get_latest_research, cleanup_old_research, get_all_topics, clear_all_research, get_image_data
-from agent import run_research, run_all_research, run_news_check, NEWS_QUERIES, TOPIC_POOL
+from datetime import datetime, timedelta, timezone
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from database import open_pool, close_pool, init_db, get_latest_research, get_research_by_id, count_research, get_all_topics, clear_all_research, get_best_image, load_source_index, load_fingerprint_index, search_research, \
+    queue_missing_images, count_image_queue, load_scheduler_state, save_scheduler_state, \
+    schedule_next_run
+from agent import backfill_image_variants, process_image_job, run_research, run_all_research, run_news_check, run_news_sweep, NEWS_QUERIES, TOPIC_POOL
+from images import IMAGE_CACHE_CONTROL, IMAGE_REVALIDATE_CACHE_CONTROL, accepted_media_types, make_etag, remember_etag, known_etag, forget_etags, etag_matches, parse_range
+import feed_cache
+import freshness
+import llm_cache
+import search_cache
+import upstream
+import image_queue
+import query_planner
+import leader
+import retention
+import transfer
+from events import subscribe, stream_events, start_listener, stop_listener
+from jobs import submit_job, get_job, list_jobs, start_workers, stop_workers, QueueFullError
 
-scheduler = BackgroundScheduler()
+scheduler = AsyncIOScheduler()
 check_count = 0
 
-def scheduled_news_check():
-    """Check for fresh news every 20 minutes"""
+# "single" checks one query; "sweep" searches several news queries and writes up each new story
+NEWS_CHECK_MODE = os.environ.get("NEWS_CHECK_MODE", "single")
+
+async def news_check(mode: str, progress=None) -> dict:
+    """Run a news check on the queries the planner picks, and record how each one did"""
+    if mode == "single":
+        query = query_planner.choose(NEWS_QUERIES, 1)[0]
+        result = await run_news_check(generate_images=True, progress=progress, query=query)
+        status = result["status"]
+        outcomes = {query: status if status in query_planner.OUTCOMES else "not_saved"}
+    else:
+        queries = query_planner.choose(NEWS_QUERIES, query_planner.NEWS_SWEEP_QUERIES)
+        result = await run_news_sweep(generate_images=True, progress=progress, queries=queries)
+        outcomes = result["query_outcomes"]
+    await query_planner.record(outcomes)
+    return result
+
+async def scheduled_news_check():
+    """Check for fresh news, then reschedule sooner or later depending on whether it found any
+
+    Only the cluster's scheduler leader runs this; the count and interval are persisted
+    so a new leader carries on where the old one stopped.
+    """
     global check_count
+    if not leader.is_leader:
+        return
     check_count += 1
     print(f"\n{'='*50}")
     print(f"Scheduled check #{check_count}")
     print(f"{'='*50}")
     
     try:
-        result = run_news_check(generate_images=True)
+        result = await news_check(NEWS_CHECK_MODE)
         print(f"Result: {result['status']}")
         
-        # Cleanup old entries periodically (every 10 checks)
+        minutes = query_planner.next_interval(result["status"] == "saved")
+        scheduler.reschedule_job("news_check", trigger="interval", minutes=minutes)
+        print(f"Next check in {minutes} minutes")
+        await save_scheduler_state(leader.LEADER_LEASE_NAME, leader.INSTANCE_ID, check_count, minutes,
+                                   datetime.now(timezone.utc) + timedelta(minutes=minutes), result["status"])
+        
+        # Apply the retention policy periodically (every 10 checks)
         if check_count % 10 == 0:
-            deleted = cleanup_old_research(keep_count=100)
-            if deleted > 0:
-                print(f"Cleaned up {deleted} old entries")
+            await retention.run_retention()
     except Exception as e:
         print(f"Error: {e}")
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    print("Starting Post-Labor Research Agent v3...")
-    init_db()
+async def start_ingestion():
+    """Became scheduler leader: resume the schedule from its persisted state"""
+    global check_count
+    state = await load_scheduler_state(leader.LEADER_LEASE_NAME)
+    check_count = state.get("check_count") or 0
+    if state.get("interval_minutes"):
+        query_planner.interval["minutes"] = state["interval_minutes"]
+    # The previous leader kept recording outcomes; start from what it left, not our startup copy
+    await query_planner.load()
+    minutes = query_planner.interval["minutes"]
     
-    # Check for news every 20 MINUTES
+    # A check the previous leader never got to runs right away; otherwise keep its timing
+    now = datetime.now(timezone.utc)
+    next_run = max(state.get("next_run_at") or now + timedelta(minutes=minutes), now)
     scheduler.add_job(
         scheduled_news_check,
         'interval',
-        minutes=20,
+        minutes=minutes,
         id='news_check',
-        next_run_time=None  # Don't run immediately
+        next_run_time=next_run,
+        replace_existing=True
     )
+    # Rolling restarts must not keep pushing the first check back
+    if not state.get("next_run_at"):
+        await schedule_next_run(leader.LEADER_LEASE_NAME, leader.INSTANCE_ID, next_run)
+    print(f"Scheduler: Checking for fresh news every {minutes} minutes ({NEWS_CHECK_MODE} mode), next at {next_run:%H:%M}")
+
+async def stop_ingestion():
+    """Lost scheduler leadership: stop scheduling checks in this process"""
+    if scheduler.get_job("news_check"):
+        scheduler.remove_job("news_check")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    print("Starting Post-Labor Research Agent v3...")
+    await open_pool()
+    await init_db()
+    print(f"Source index: {await load_source_index()} known URLs")
+    print(f"Fingerprint index: {await load_fingerprint_index()} signatures")
+    print(f"Query stats: {await query_planner.load()} queries")
+    
+    # Every process serves requests; only the elected leader schedules news checks
     scheduler.start()
-    print("Scheduler: Checking for fresh news every 20 minutes")
+    leader.start_election(start_ingestion, stop_ingestion)
+    start_workers()
+    image_queue.start_image_workers(process_image_job)
+    start_listener()
     print(f"News queries: {len(NEWS_QUERIES)} | Topic pool: {len(TOPIC_POOL)}")
     
     yield
+    await leader.stop_election(stop_ingestion)
     scheduler.shutdown()
+    await stop_workers()
+    await image_queue.stop_image_workers()
+    await stop_listener()
+    await upstream.close_http_client()
+    await close_pool()
 
 app = FastAPI(
     title="Post-Labor Research Agent",
@@ -72,28 +154,94 @@ async def root():
         "status": "online",
         "service": "Post-Labor Research Agent",
         "version": "3.0.0",
-        "schedule": "Every 20 minutes (only saves if fresh)",
-        "checks_since_start": check_count
+        "schedule": f"Every {query_planner.interval['minutes']} minutes, adaptive (only saves if fresh)",
+        "checks_since_start": check_count,
+        "scheduler_leader": leader.is_leader
     }
 
 @app.get("/health")
 async def health():
     return {"status": "healthy"}
 
+# Feed responses may be reused by the browser after revalidating with the ETag
+FEED_CACHE_CONTROL = "no-cache"
+
+async def cached_json(key: str, if_none_match: str, build) -> Response:
+    """Serve a feed response from the in-process cache, building it on a miss.
+
+    Conditional requests that match the cached ETag get a 304 without touching the database.
+    """
+    entry = feed_cache.lookup(key)
+    if entry is None:
+        at_version = feed_cache.version
+        try:
+            body = await build()
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        entry = feed_cache.store(key, json.dumps(body).encode(), at_version)
+    
+    headers = {"ETag": entry["etag"], "Cache-Control": FEED_CACHE_CONTROL}
+    if etag_matches(if_none_match, entry["etag"]):
+        feed_cache.stats["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry["body"], media_type="application/json", headers=headers)
+
+def encode_cursor(*parts) -> str:
+    """Encode keyset values as an opaque pagination cursor"""
+    return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode().rstrip("=")
+
+def cursor_part(value, kind):
+    """Check one decoded cursor value: datetime parts are ISO strings, the rest JSON numbers"""
+    if kind is datetime:
+        return datetime.fromisoformat(value)
+    if isinstance(value, bool) or not isinstance(value, kind):
+        raise ValueError(f"expected {kind}")
+    return value
+
+def decode_cursor(cursor: str, *kinds) -> list:
+    """Decode a cursor from encode_cursor into values of the given types, or raise 400 if it is malformed"""
+    try:
+        parts = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(parts, list) or len(parts) != len(kinds):
+            raise ValueError("wrong size")
+        return [cursor_part(part, kind) for part, kind in zip(parts, kinds)]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 @app.get("/api/research")
 async def get_research(
     limit: int = Query(default=10, ge=1, le=100),
-    offset: int = Query(default=0, ge=0)
+    offset: int = Query(default=0, ge=0),
+    cursor: str = Query(default=None),
+    view: str = Query(default="full", pattern="^(compact|full)$"),
+    if_none_match: str = Header(default=None)
 ):
-    """Get research with pagination"""
-    try:
-        # Get total count first
-        all_research = get_latest_research(limit=1000)
-        total = len(all_research)
+    """Get research with pagination
+
+    Pass `next_cursor` from a previous page as `cursor` for keyset pagination;
+    `offset` still works for older clients but is ignored when a cursor is given.
+    `view=compact` returns only what a card needs (topic, a summary teaser, image
+    fields); the full record is at /api/research/{id}.
+    """
+    before = None
+    if cursor:
+        created_at, research_id = decode_cursor(cursor, datetime, int)
+        before = (created_at, research_id)
+        offset = 0
+    
+    async def build():
+        total = await count_research()
         
-        # Get paginated results
-        updates = get_latest_research(limit=limit + offset)
-        paginated = updates[offset:offset + limit] if offset < len(updates) else []
+        # Fetch one extra row to learn whether another page exists
+        rows = await get_latest_research(limit=limit + 1, offset=offset, before=before, view=view)
+        paginated = rows[:limit]
+        has_more = len(rows) > limit
+        next_cursor = None
+        if has_more:
+            last = paginated[-1]
+            next_cursor = encode_cursor(last["created_at"], last["id"])
         
         return {
             "updates": paginated,
@@ -101,81 +249,312 @@ async def get_research(
             "total": total,
             "offset": offset,
             "limit": limit,
-            "has_more": offset + limit < total
+            "has_more": has_more,
+            "next_cursor": next_cursor,
+            "view": view
         }
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    
+    return await cached_json(f"research:{view}:{limit}:{offset}:{cursor}", if_none_match, build)
 
 @app.get("/api/research/all")
-async def get_all_research():
-    """Get ALL research entries for archive view"""
-    try:
-        updates = get_latest_research(limit=500)
+async def get_all_research(
+    view: str = Query(default="full", pattern="^(compact|full)$"),
+    if_none_match: str = Header(default=None)
+):
+    """Get ALL research entries for archive view (`view=compact` for card-sized records)"""
+    async def build():
+        updates = await get_latest_research(limit=500, view=view)
         return {
             "updates": updates,
-            "total": len(updates)
+            "total": len(updates),
+            "view": view
         }
+    
+    return await cached_json(f"research_all:{view}", if_none_match, build)
+
+@app.get("/api/research/export")
+async def export_research(
+    images: bool = Query(default=False),
+    gzip: bool = Query(default=False)
+):
+    """Stream the whole archive as NDJSON, one record per line, oldest first
+
+    Memory stays flat however large the archive is. `images=true` inlines each
+    original image as base64; `gzip=true` compresses the stream. The output can
+    be loaded back with POST /api/research/import.
+    """
+    filename = f"research-{datetime.now():%Y%m%d-%H%M%S}.ndjson" + (".gz" if gzip else "")
+    return StreamingResponse(
+        transfer.export_ndjson(include_images=images, compress=gzip),
+        media_type="application/gzip" if gzip else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+@app.post("/api/research/import")
+async def import_research_ndjson(request: Request):
+    """Bulk-load NDJSON records (plain or gzipped) from an export or retention archive segments
+
+    Loaded with COPY in a single transaction: a malformed line rejects the whole
+    import. Existing ids are skipped, so re-running an import is safe.
+    """
+    try:
+        result = await transfer.import_ndjson(request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if result["sources_indexed"]:
+        await load_source_index()
+    image_queue.wake()
+    return {"status": "imported", **result}
+
+@app.get("/api/research/search")
+async def search(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=10, ge=1, le=50),
+    cursor: str = Query(default=None)
+):
+    """Full-text search over the research archive, ranked, with highlighted snippets
+
+    Supports web-search syntax ("quoted phrases", OR, -excluded). Pass `next_cursor`
+    from a previous page as `cursor` to continue.
+    """
+    after = None
+    if cursor:
+        rank, research_id = decode_cursor(cursor, (int, float), int)
+        after = (rank, research_id)
+    
+    try:
+        # Fetch one extra row to learn whether another page exists
+        rows = await search_research(q, limit=limit + 1, after=after)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    results = rows[:limit]
+    has_more = len(rows) > limit
+    next_cursor = encode_cursor(results[-1]["rank"], results[-1]["id"]) if has_more else None
+    return {
+        "query": q,
+        "results": results,
+        "count": len(results),
+        "has_more": has_more,
+        "next_cursor": next_cursor
+    }
+
+async def enqueue(kind: str, params: dict, runner) -> dict:
+    """Submit a background job and describe it for the 202 response"""
+    try:
+        job, coalesced = await submit_job(kind, params, runner)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "status": job["status"],
+        "job_id": job["id"],
+        "coalesced": coalesced,
+        "status_url": f"/api/jobs/{job['id']}"
+    }
+
+@app.get("/api/research/stream")
+async def stream_research(
+    last_event_id: str = Header(default=None),
+    since: int = Query(default=None, ge=0)
+):
+    """Server-Sent Events feed pushing new research as soon as it is saved
 
-@app.post("/api/research/run")
+    Reconnecting clients resume via the Last-Event-ID header (or `?since=<id>`).
+    """
+    queue = subscribe()
+    if queue is None:
+        raise HTTPException(status_code=503, detail="Too many stream clients")
+    
+    resume_from = since
+    if last_event_id and last_event_id.isdigit():
+        resume_from = int(last_event_id)
+    
+    return StreamingResponse(
+        stream_events(queue, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/research/run", status_code=202)
 async def trigger_research(
     topic: str = Query(default=None),
     force: bool = Query(default=False)
 ):
-    """Manually trigger research"""
+    """Queue research on one topic (or a sample of topics) as a background job"""
+    if topic:
+        return await enqueue("research", {"topic": topic, "force": force},
+                       lambda progress: run_research(topic, force=force, generate_images=True, progress=progress))
+    return await enqueue("research_all", {"force": force},
+                   lambda progress: run_all_research(force=force, generate_images=True, progress=progress))
+
+@app.post("/api/research/check", status_code=202)
+async def trigger_news_check(mode: str = Query(default=NEWS_CHECK_MODE, pattern="^(sweep|single)$")):
+    """Queue a news freshness check as a background job (`mode=sweep` for all queries, `single` for one)"""
+    return await enqueue("news_check", {"mode": mode},
+                   lambda progress: news_check(mode, progress=progress))
+
+@app.post("/api/images/backfill", status_code=202)
+async def trigger_image_backfill():
+    """Queue a batch job generating resized variants for images stored before variants existed"""
+    return await enqueue("image_backfill", {},
+                   lambda progress: backfill_image_variants(progress=progress))
+
+@app.post("/api/images/queue-missing")
+async def queue_missing():
+    """Queue image generation for every record without an image (e.g. saved with generate_images=false, or failed)"""
     try:
-        if topic:
-            result = run_research(topic, force=force, generate_images=True)
-            return {"status": "completed", "result": result}
-        else:
-            results = run_all_research(force=force, generate_images=True)
-            return {"status": "completed", "results": results}
+        queued = await queue_missing_images()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if queued:
+        image_queue.wake()
+    return {"status": "queued", "queued": queued}
 
-@app.post("/api/research/check")
-async def trigger_news_check():
-    """Manually trigger a news freshness check"""
+@app.get("/api/images/queue")
+async def get_image_queue():
+    """Records per image_status, plus this worker's image queue counters"""
     try:
-        result = run_news_check(generate_images=True)
-        return {"status": "completed", "result": result}
+        return {"by_status": await count_image_queue(), **image_queue.get_stats()}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/research/history")
-async def get_history():
-    """Get unique topics researched"""
+@app.post("/api/retention/run", status_code=202)
+async def trigger_retention(
+    keep_count: int = Query(default=None, ge=0),
+    max_age_days: float = Query(default=None, ge=0),
+    archive: bool = Query(default=None)
+):
+    """Queue a retention pass (defaults come from the RETENTION_* settings; 0 disables a rule)"""
+    params = {"keep_count": keep_count, "max_age_days": max_age_days, "archive": archive}
+    return await enqueue("retention", params,
+                   lambda progress: retention.run_retention(keep_count, max_age_days, archive, progress=progress))
+
+@app.get("/api/jobs")
+async def get_jobs(limit: int = Query(default=20, ge=1, le=200)):
+    """List recent background jobs"""
     try:
-        return {"history": get_all_topics(), "count": len(get_all_topics())}
+        return {"jobs": await list_jobs(limit)}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Get stage-by-stage progress and result of a background job"""
+    try:
+        job = await get_job(job_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/api/research/history")
+async def get_history(if_none_match: str = Header(default=None)):
+    """Get unique topics researched"""
+    async def build():
+        history = await get_all_topics()
+        return {"history": history, "count": len(history)}
+    
+    return await cached_json("history", if_none_match, build)
+
 @app.delete("/api/research/clear")
 async def clear_research():
     """Clear all research"""
     try:
-        deleted = clear_all_research()
+        deleted = await clear_all_research()
+        forget_etags()
         return {"status": "cleared", "deleted": deleted}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/stats")
+async def get_stats():
+    """Cache and pipeline counters"""
+    return {
+        "feed_cache": feed_cache.get_stats(),
+        "dedupe": freshness.get_stats(),
+        "llm_cache": llm_cache.get_stats(),
+        "search_cache": search_cache.get_stats(),
+        "upstream": upstream.get_stats(),
+        "scheduler": leader.get_stats(),
+        "retention": retention.get_stats(),
+        "transfer": transfer.get_stats()
+    }
+
+@app.get("/api/queries/stats")
+async def get_query_stats():
+    """Per-news-query outcome history used by the adaptive scheduler, best first"""
+    return query_planner.get_stats()
+
 @app.get("/api/ping")
 async def ping():
     return {"pong": True}
 
+@app.get("/api/research/{research_id}")
+async def get_research_detail(research_id: int, if_none_match: str = Header(default=None)):
+    """Get one full research record (summary, sources, key stats), e.g. when a compact card is opened"""
+    async def build():
+        record = await get_research_by_id(research_id)
+        if not record:
+            raise HTTPException(status_code=404, detail="Research not found")
+        return record
+    
+    return await cached_json(f"research_detail:{research_id}", if_none_match, build)
+
 @app.get("/api/research/{research_id}/image")
-async def get_research_image(research_id: int):
-    """Serve image for a research entry from PostgreSQL"""
+async def get_research_image(
+    research_id: int,
+    w: int = Query(default=None, ge=16, le=4096),
+    v: str = Query(default=None, max_length=64),
+    accept: str = Header(default=None),
+    if_none_match: str = Header(default=None),
+    range_header: str = Header(default=None, alias="Range")
+):
+    """Serve image for a research entry from PostgreSQL
+
+    Returns the smallest stored variant at least `w` pixels wide, in the
+    smallest format the client accepts (AVIF, WebP, else the original PNG).
+    The image behind this URL changes when one is attached or variants are
+    backfilled, so it is revalidated, and revalidations get a 304 without a
+    database query. A URL pinned with the record's current `v=<image_version>`
+    is cached as immutable instead.
+    """
+    media_types = accepted_media_types(accept)
+    selection = f"w{w or ''}:{'+'.join(media_types)}"
+    cache_headers = {"Cache-Control": IMAGE_REVALIDATE_CACHE_CONTROL, "Accept-Ranges": "bytes", "Vary": "Accept"}
+    
+    # Pinned URLs are rarely revalidated; they check their version against the database
+    etag = known_etag(research_id, selection)
+    if etag and not v and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, **cache_headers})
+    
     try:
-        image_data = get_image_data(research_id)
-        if not image_data:
-            raise HTTPException(status_code=404, detail="Image not found")
-        
-        # Decode base64 and return as PNG
-        image_bytes = base64.b64decode(image_data)
-        return Response(content=image_bytes, media_type="image/png")
-    except HTTPException:
-        raise
+        image = await get_best_image(research_id, width=w, media_types=media_types)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    if not image:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    etag = make_etag(image["hash"])
+    remember_etag(research_id, selection, etag)
+    if v and v == image["version"]:
+        cache_headers["Cache-Control"] = IMAGE_CACHE_CONTROL
+    headers = {"ETag": etag, **cache_headers}
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    
+    data = image["data"]
+    try:
+        byte_range = parse_range(range_header, len(data))
+    except ValueError:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{len(data)}", **headers})
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+        return Response(content=data[start:end + 1], status_code=206, media_type=image["media_type"], headers=headers)
+    return Response(content=data, media_type=image["media_type"], headers=headers)
@@ -0,0 +1,84 @@
+import os
+import random
+from database import load_query_stats, save_query_stats
+
+# Queries searched per scheduled sweep, chosen by Thompson sampling on each query's record
+NEWS_SWEEP_QUERIES = int(os.environ.get("NEWS_SWEEP_QUERIES", "5"))
+# Older outcomes count for less, so a query that went quiet (or came alive) is noticed
+QUERY_STATS_DECAY = float(os.environ.get("QUERY_STATS_DECAY", "0.95"))
+
+# Check interval adapts to how often checks find something: shorter after a save, longer after a miss
+CHECK_INTERVAL_MINUTES = float(os.environ.get("CHECK_INTERVAL_MINUTES", "20"))
+CHECK_INTERVAL_MIN_MINUTES = float(os.environ.get("CHECK_INTERVAL_MIN_MINUTES", "10"))
+CHECK_INTERVAL_MAX_MINUTES = float(os.environ.get("CHECK_INTERVAL_MAX_MINUTES", "60"))
+INTERVAL_SPEEDUP = 0.75
+INTERVAL_SLOWDOWN = 1.25
+
+# Outcomes recorded per query; only "saved" counts as a success
+OUTCOMES = ("saved", "not_saved", "not_fresh", "no_results")
+
+stats = {}  # query -> {"checks", outcome counts..., "alpha", "beta", "last_outcome", "last_checked_at"}
+totals = {"checks": 0, "searches": 0, "searches_skipped": 0}
+interval = {"minutes": CHECK_INTERVAL_MINUTES}
+
+def _empty() -> dict:
+    return {"checks": 0, **{o: 0 for o in OUTCOMES}, "alpha": 0.0, "beta": 0.0,
+            "last_outcome": None, "last_checked_at": None}
+
+async def load():
+    """Load per-query history from the database (at startup and on becoming leader)"""
+    stats.clear()
+    for query, record in (await load_query_stats()).items():
+        stats[query] = {**_empty(), **record}
+    return len(stats)
+
+def sample(query: str) -> float:
+    """Thompson sample of a query's chance of finding a new story"""
+    record = stats.get(query) or _empty()
+    return random.betavariate(1 + record["alpha"], 1 + record["beta"])
+
+def choose(queries: list, k: int) -> list:
+    """Pick the k queries with the highest sampled success chance"""
+    k = max(1, min(k, len(queries)))
+    ranked = sorted(queries, key=sample, reverse=True)
+    totals["checks"] += 1
+    totals["searches"] += k
+    totals["searches_skipped"] += len(queries) - k
+    return ranked[:k]
+
+async def record(outcomes: dict):
+    """Record each query's outcome ("saved" | "not_saved" | "not_fresh" | "no_results") and persist it"""
+    outcomes = {q: o if o in OUTCOMES else "not_saved" for q, o in outcomes.items()}
+    try:
+        # Stored history is updated in place and read back, so other processes' outcomes are kept
+        for query, record in (await save_query_stats(outcomes, QUERY_STATS_DECAY)).items():
+            stats[query] = {**_empty(), **record}
+    except Exception as e:
+        print(f"Could not save query stats: {e}")
+
+def next_interval(found_news: bool) -> float:
+    """Adjust and return the check interval (minutes) after a scheduled check"""
+    factor = INTERVAL_SPEEDUP if found_news else INTERVAL_SLOWDOWN
+    interval["minutes"] = round(min(CHECK_INTERVAL_MAX_MINUTES,
+                                    max(CHECK_INTERVAL_MIN_MINUTES, interval["minutes"] * factor)), 1)
+    return interval["minutes"]
+
+def get_stats() -> dict:
+    """Per-query history, best first, with totals for the stats endpoint"""
+    queries = {}
+    for query, record in stats.items():
+        checks = record["checks"]
+        queries[query] = {
+            **{k: v for k, v in record.items() if k not in ("alpha", "beta")},
+            "save_rate": round(record["saved"] / checks, 3) if checks else None,
+            "score": round((1 + record["alpha"]) / (2 + record["alpha"] + record["beta"]), 3)
+        }
+    searches = sum(r["checks"] for r in stats.values())
+    wasted = searches - sum(r["saved"] for r in stats.values())
+    return {
+        "queries": dict(sorted(queries.items(), key=lambda item: item[1]["score"], reverse=True)),
+        "searches_recorded": searches,
+        "searches_without_story": wasted,
+        "since_restart": dict(totals),
+        "interval_minutes": interval["minutes"]
+    }
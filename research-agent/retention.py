@@ -0,0 +1,109 @@
+import os
+import gzip
+import json
+import time
+import asyncio
+from datetime import datetime
+from database import get_retention_boundary, evict_research_batch
+from images import forget_etags
+
+# Retention policy: keep the newest RETENTION_KEEP_COUNT records and/or drop records
+# older than RETENTION_MAX_AGE_DAYS (0 disables either rule)
+RETENTION_KEEP_COUNT = int(os.environ.get("RETENTION_KEEP_COUNT", "100"))
+RETENTION_MAX_AGE_DAYS = float(os.environ.get("RETENTION_MAX_AGE_DAYS", "0"))
+# Rows deleted per transaction, so locks are short and big image rows aren't dragged along at once
+RETENTION_BATCH_SIZE = int(os.environ.get("RETENTION_BATCH_SIZE", "25"))
+
+# Evicted records are written to gzipped NDJSON segments here first (empty disables archiving);
+# original images go to images/<hash prefix>/<hash>.<ext> under the same directory
+RETENTION_ARCHIVE_DIR = os.environ.get("RETENTION_ARCHIVE_DIR", "")
+RETENTION_ARCHIVE_IMAGES = os.environ.get("RETENTION_ARCHIVE_IMAGES", "true").lower() == "true"
+
+MEDIA_TYPE_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp", "image/avif": "avif"}
+
+stats = {"runs": 0, "rows_deleted": 0, "bytes_reclaimed": 0, "rows_archived": 0,
+         "image_bytes_archived": 0, "segments_written": 0, "last_run": None}
+
+def _write_atomic(path: str, data: bytes):
+    """Write a file via a temp file + rename so readers never see a partial file"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+def image_path(image_hash: str, media_type: str) -> str:
+    """Archive-relative path of a cold-stored image (content-addressed)"""
+    return os.path.join("images", image_hash[:2], f"{image_hash}.{MEDIA_TYPE_EXTENSIONS.get(media_type, 'bin')}")
+
+async def archive_image(image_hash: str, media_type: str, data: bytes) -> str:
+    """Copy an image to cold storage (once per hash); returns its archive-relative path"""
+    relative = image_path(image_hash, media_type)
+    path = os.path.join(RETENTION_ARCHIVE_DIR, relative)
+    if not os.path.exists(path):
+        await asyncio.to_thread(_write_atomic, path, data)
+    return relative
+
+async def archive_segment(records: list) -> str:
+    """Write evicted records as one gzipped NDJSON segment; returns its path"""
+    name = f"research-{datetime.now():%Y%m%dT%H%M%S}-{records[0]['id']}-{records[-1]['id']}.ndjson.gz"
+    path = os.path.join(RETENTION_ARCHIVE_DIR, "segments", name)
+    body = "".join(json.dumps(record, default=str) + "\n" for record in records).encode()
+    await asyncio.to_thread(_write_atomic, path, gzip.compress(body))
+    stats["segments_written"] += 1
+    return path
+
+async def run_retention(keep_count: int = None, max_age_days: float = None, archive: bool = None,
+                        progress=None) -> dict:
+    """Apply the retention policy in keyset batches, archiving first if configured"""
+    keep_count = RETENTION_KEEP_COUNT if keep_count is None else keep_count
+    max_age_days = RETENTION_MAX_AGE_DAYS if max_age_days is None else max_age_days
+    archive = bool(RETENTION_ARCHIVE_DIR) if archive is None else archive and bool(RETENTION_ARCHIVE_DIR)
+    started = time.perf_counter()
+    
+    boundary = await get_retention_boundary(keep_count=keep_count or None, max_age_days=max_age_days or None)
+    result = {"deleted": 0, "bytes_reclaimed": 0, "archived": 0, "image_bytes_archived": 0, "batches": 0}
+    while boundary:
+        batch = await evict_research_batch(
+            boundary,
+            limit=RETENTION_BATCH_SIZE,
+            archive_image=archive_image if archive and RETENTION_ARCHIVE_IMAGES else None,
+            archive_segment=archive_segment if archive else None
+        )
+        if not batch["ids"]:
+            break
+        forget_etags(batch["ids"])
+        result["batches"] += 1
+        result["deleted"] += len(batch["ids"])
+        result["bytes_reclaimed"] += batch["bytes"]
+        result["image_bytes_archived"] += batch["image_bytes_archived"]
+        if archive:
+            result["archived"] += len(batch["ids"])
+        if progress:
+            progress("batch", deleted=result["deleted"], last_id=batch["ids"][-1])
+    
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    stats["runs"] += 1
+    stats["rows_deleted"] += result["deleted"]
+    stats["bytes_reclaimed"] += result["bytes_reclaimed"]
+    stats["rows_archived"] += result["archived"]
+    stats["image_bytes_archived"] += result["image_bytes_archived"]
+    stats["last_run"] = {**result, "at": datetime.now().isoformat(timespec="seconds")}
+    if result["deleted"]:
+        print(f"Retention: deleted {result['deleted']} rows ({result['bytes_reclaimed'] // 1024}KB), "
+              f"archived {result['archived']} in {result['batches']} batches")
+    return result
+
+def get_stats() -> dict:
+    """Retention counters and policy for the stats endpoint"""
+    return {
+        **stats,
+        "policy": {
+            "keep_count": RETENTION_KEEP_COUNT or None,
+            "max_age_days": RETENTION_MAX_AGE_DAYS or None,
+            "batch_size": RETENTION_BATCH_SIZE,
+            "archive_dir": RETENTION_ARCHIVE_DIR or None
+        }
+    }
@@ -0,0 +1,81 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+
+# Search results are reused for SEARCH_CACHE_TTL seconds, and kept for
+# SEARCH_CACHE_STALE_HOURS as a fallback for when the search API fails
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", "600"))
+SEARCH_CACHE_STALE_HOURS = float(os.environ.get("SEARCH_CACHE_STALE_HOURS", "24"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "200"))
+
+_entries = OrderedDict()  # (query, max_results, depth) -> {"results", "stored_at"}, least recently used first
+_inflight = {}  # key -> task fetching it, shared by concurrent callers
+stats = {"hits": 0, "misses": 0, "coalesced": 0, "stale_served": 0}
+
+def _age(entry: dict) -> float:
+    return time.monotonic() - entry["stored_at"]
+
+def lookup(key: tuple) -> list:
+    """Cached results younger than the TTL, or None"""
+    entry = _entries.get(key)
+    if entry is None or _age(entry) > SEARCH_CACHE_TTL:
+        return None
+    _entries.move_to_end(key)
+    return entry["results"]
+
+def stale(key: tuple) -> list:
+    """Last results for a key within the stale window (used when a fetch fails), or None"""
+    entry = _entries.get(key)
+    if entry is None or not entry["results"] or _age(entry) > SEARCH_CACHE_STALE_HOURS * 3600:
+        return None
+    stats["stale_served"] += 1
+    return entry["results"]
+
+def store(key: tuple, results: list):
+    _entries[key] = {"results": results, "stored_at": time.monotonic()}
+    _entries.move_to_end(key)
+    while len(_entries) > SEARCH_CACHE_MAX_ENTRIES:
+        _entries.popitem(last=False)
+
+async def _fetch_and_store(key: tuple, fetch) -> list:
+    results = await fetch()
+    store(key, results)
+    return results
+
+def _finished(key: tuple, task: asyncio.Task):
+    _inflight.pop(key, None)
+    if not task.cancelled():
+        task.exception()  # Retrieved here so an error nobody awaited isn't logged as unhandled
+
+async def get_or_fetch(key: tuple, fetch) -> list:
+    """Cached results for `key`, or the result of `fetch()`.
+
+    Concurrent callers for the same key share one in-flight fetch; one
+    caller being cancelled doesn't cancel it for the others. Fetch errors
+    propagate to every waiting caller.
+    """
+    results = lookup(key)
+    if results is not None:
+        stats["hits"] += 1
+        return results
+
+    task = _inflight.get(key)
+    if task is None:
+        stats["misses"] += 1
+        task = asyncio.ensure_future(_fetch_and_store(key, fetch))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _finished(key, t))
+    else:
+        stats["coalesced"] += 1
+    return await asyncio.shield(task)
+
+def get_stats() -> dict:
+    """Hit/miss counters for the stats endpoint"""
+    lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+    return {
+        **stats,
+        "hit_rate": round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else None,
+        "entries": len(_entries),
+        "in_flight": len(_inflight)
+    }
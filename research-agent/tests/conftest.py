@@ -0,0 +1,11 @@
+import os
+import sys
+
+# Tests import the service modules the way uvicorn does, from research-agent/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
@@ -0,0 +1,92 @@
+import time
+import asyncio
+import httpx
+import pytest
+import feed_cache
+import jobs
+import main
+
+SLOW_RUN_SECONDS = 1.5
+DB_LATENCY_SECONDS = 0.005
+
+RECORD = {"id": 1, "topic": "Automation", "summary": "Summary", "sources": [], "key_stats": [],
+          "image_url": None, "image_prompt": None, "created_at": "2026-01-01T00:00:00", "image_status": "none"}
+
+@pytest.fixture
+def mocked(monkeypatch):
+    """Stub the database helpers behind /api/research and job tracking, and make research slow"""
+    async def count_research():
+        await asyncio.sleep(DB_LATENCY_SECONDS)
+        return 1
+
+    async def get_latest_research(limit=10, offset=0, before=None, view="full"):
+        await asyncio.sleep(DB_LATENCY_SECONDS)
+        return [RECORD]
+
+    running = asyncio.Event()
+
+    async def run_research(topic, force=False, generate_images=True, progress=None):
+        # Stands in for the OpenAI/DALL-E round trips, which are awaited, not blocking
+        running.set()
+        await asyncio.sleep(SLOW_RUN_SECONDS)
+        return {"status": "success", "topic": topic}
+
+    job_rows = {}
+
+    async def insert_job(job_id, kind, params, coalesce_key, owner):
+        job_rows[job_id] = {"id": job_id, "kind": kind, "params": params, "status": "queued", "stage": None,
+                            "stages": [], "result": None, "error": None, "worker": owner}
+        return dict(job_rows[job_id]), True
+
+    async def update_job(job_id, version, status, stage, stages, result=None, error=None, **kwargs):
+        job_rows[job_id].update(status=status, stage=stage, result=result, error=error)
+
+    async def noop(*args, **kwargs):
+        return 0
+
+    monkeypatch.setattr(main, "count_research", count_research)
+    monkeypatch.setattr(main, "get_latest_research", get_latest_research)
+    monkeypatch.setattr(main, "run_research", run_research)
+    monkeypatch.setattr(jobs, "insert_job", insert_job)
+    monkeypatch.setattr(jobs, "update_job", update_job)
+    monkeypatch.setattr(jobs, "prune_jobs", noop)
+    monkeypatch.setattr(jobs, "heartbeat_jobs", noop)
+    return {"running": running, "jobs": job_rows}
+
+async def timed_get(client: httpx.AsyncClient) -> float:
+    feed_cache.bump_version()  # Every request goes through the (mocked) database
+    started = time.perf_counter()
+    response = await client.get("/api/research")
+    assert response.status_code == 200
+    assert response.json()["updates"][0]["id"] == RECORD["id"]
+    return time.perf_counter() - started
+
+@pytest.mark.anyio
+async def test_research_latency_flat_during_slow_run(mocked):
+    jobs.start_workers()
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            idle = [await timed_get(client) for _ in range(10)]
+
+            response = await client.post("/api/research/run", params={"topic": "Automation"})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            await asyncio.wait_for(mocked["running"].wait(), timeout=1)
+
+            started = time.perf_counter()
+            busy = []
+            while time.perf_counter() - started < SLOW_RUN_SECONDS / 2:
+                busy.append(await timed_get(client))
+            assert mocked["jobs"][job_id]["status"] == "running"
+
+            # A blocked event loop would stall these behind the whole run
+            assert len(busy) >= 10
+            assert max(busy) < max(idle) + 0.1
+            assert sorted(busy)[len(busy) // 2] < 5 * sorted(idle)[len(idle) // 2] + 0.02
+
+            while mocked["jobs"][job_id]["status"] == "running":
+                await asyncio.sleep(0.05)
+            assert mocked["jobs"][job_id]["status"] == "completed"
+    finally:
+        await jobs.stop_workers()
@@ -0,0 +1,97 @@
+import os
+import contextlib
+from datetime import datetime
+import pytest
+import database
+
+# Plans come from the configured database: schema is created if missing, no rows are written
+pytestmark = [
+    pytest.mark.anyio,
+    pytest.mark.skipif(not os.environ.get("DATABASE_URL"), reason="DATABASE_URL not set")
+]
+
+get_connection = database.get_connection  # Unrecorded, for running EXPLAIN
+
+@pytest.fixture
+async def captured(monkeypatch):
+    """Open the pool and record every statement the database helpers execute"""
+    await database.open_pool()
+    await database.init_db()
+    statements = []
+
+    class Recorder:
+        def __init__(self, conn):
+            self.conn = conn
+
+        async def execute(self, query, params=None, **kwargs):
+            statements.append((query, params))
+            return await self.conn.execute(query, params, **kwargs)
+
+        def __getattr__(self, name):
+            return getattr(self.conn, name)
+
+    @contextlib.asynccontextmanager
+    async def recording_connection():
+        async with get_connection() as conn:
+            yield Recorder(conn)
+
+    monkeypatch.setattr(database, "get_connection", recording_connection)
+    yield statements
+    monkeypatch.undo()
+    await database.close_pool()
+
+async def plan(query: str, params) -> dict:
+    """EXPLAIN a statement with sequential scans and sorts disabled, so any that remain are unavoidable
+
+    Disabling them also keeps plans independent of table size: on a small table
+    a scan plus sort is otherwise cheaper than walking an index.
+    """
+    async with get_connection() as conn:
+        async with conn.transaction():
+            await conn.execute("SET LOCAL enable_seqscan = off")
+            await conn.execute("SET LOCAL enable_sort = off")
+            cur = await conn.execute("EXPLAIN (FORMAT JSON) " + query, params)
+            return (await cur.fetchone())[0][0]["Plan"]
+
+def walk(node: dict, parent: dict = None):
+    yield node, parent
+    for child in node.get("Plans", []):
+        yield from walk(child, node)
+
+def assert_indexed(node: dict):
+    """No sequential scans, and no sort feeding a LIMIT (the index must deliver the order)"""
+    for child, parent in walk(node):
+        assert child["Node Type"] != "Seq Scan", f"seq scan on {child.get('Relation Name')}"
+        if child["Node Type"] == "Sort" and parent and parent["Node Type"] == "Limit":
+            pytest.fail(f"sort under LIMIT on {child['Sort Key']}")
+
+async def test_cache_check_uses_topic_index(captured):
+    await database.topic_exists_recently("ai jobs")
+    await database.get_similar_research("ai jobs")
+    probe, similar = captured
+
+    assert_indexed(await plan(*probe))
+    # The exact-topic branch answers a cache hit; the keyword fallback needs pg_trgm to be indexed
+    append = next(n for n, _ in walk(await plan(*similar)) if n["Node Type"] == "Append")
+    exact = append["Plans"][0]
+    assert_indexed(exact)
+    assert "idx_research_topic_key_created" in {n.get("Index Name") for n, _ in walk(exact)}
+
+@pytest.mark.parametrize("view", ["full", "compact"])
+async def test_listing_pages_walk_created_index(captured, view):
+    await database.get_latest_research(limit=11, view=view)
+    await database.get_latest_research(limit=11, offset=20, view=view)
+    await database.get_latest_research(limit=11, before=(datetime.now().isoformat(), 2**31 - 1), view=view)
+
+    for statement in captured:
+        node = await plan(*statement)
+        assert_indexed(node)
+        indexes = {n.get("Index Name") for n, _ in walk(node)}
+        assert "idx_research_created_id" in indexes
+
+async def test_history_walks_last_seen_index(captured):
+    await database.get_all_topics()
+    node = await plan(*captured[0])
+    assert_indexed(node)
+    assert not any(n["Node Type"] == "Sort" for n, _ in walk(node))
+    assert "idx_topic_stats_last_seen" in {n.get("Index Name") for n, _ in walk(node)}
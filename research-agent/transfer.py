@@ -0,0 +1,153 @@
+import os
+import json
+import zlib
+import base64
+import asyncio
+from database import stream_research, import_research
+from retention import RETENTION_ARCHIVE_DIR
+
+# Rows fetched per round trip while exporting; image rows are ~1-2MB each, so far fewer of those
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", "500"))
+EXPORT_IMAGE_BATCH_SIZE = int(os.environ.get("EXPORT_IMAGE_BATCH_SIZE", "10"))
+# Bytes buffered before a chunk is sent to the client
+EXPORT_CHUNK_BYTES = 64 * 1024
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+stats = {"exports": 0, "rows_exported": 0, "imports": 0, "rows_imported": 0, "rows_skipped": 0, "images_imported": 0}
+
+async def export_ndjson(include_images: bool = False, compress: bool = False):
+    """Yield the whole archive as NDJSON byte chunks (gzipped if `compress`), one record per line
+
+    Records use the retention archive format; with `include_images` the original
+    image travels inline as base64 in image.data.
+    """
+    stats["exports"] += 1
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    batch_size = EXPORT_IMAGE_BATCH_SIZE if include_images else EXPORT_BATCH_SIZE
+    buffer, size = [], 0
+
+    async for record in stream_research(include_images, batch_size=batch_size):
+        if "image" in record:
+            record["image"]["data"] = base64.b64encode(record["image"]["data"]).decode()
+        line = (json.dumps(record, default=str) + "\n").encode()
+        buffer.append(line)
+        size += len(line)
+        stats["rows_exported"] += 1
+        if size >= EXPORT_CHUNK_BYTES:
+            chunk = b"".join(buffer)
+            buffer, size = [], 0
+            yield compressor.compress(chunk) if compressor else chunk
+
+    chunk = b"".join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+def _archive_file(relative: str) -> bytes:
+    """Read a cold-stored image referenced by an archive record (paths stay inside the archive)"""
+    root = os.path.realpath(RETENTION_ARCHIVE_DIR)
+    path = os.path.realpath(os.path.join(root, relative))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        return f.read()
+
+async def _load_image(image: dict) -> dict:
+    """Image bytes for an imported record: inline base64, else a path into RETENTION_ARCHIVE_DIR"""
+    data = None
+    if image.get("data"):
+        data = base64.b64decode(image["data"])
+    elif image.get("path") and RETENTION_ARCHIVE_DIR:
+        data = await asyncio.to_thread(_archive_file, image["path"])
+    return {"data": data, "media_type": image.get("media_type")} if data else None
+
+# Optional record fields and the JSON types they must have (null is always allowed)
+RECORD_FIELD_TYPES = {"id": int, "sources": list, "key_stats": list, "image_url": str,
+                      "image_prompt": str, "created_at": str, "image_status": str}
+TYPE_NAMES = {int: "an integer", list: "a list", str: "a string"}
+
+def check_record(record: dict):
+    """Raise ValueError unless an import record has the field types the feed relies on"""
+    for field in ("topic", "summary"):
+        if not isinstance(record.get(field), str) or not record[field].strip():
+            raise ValueError(f"{field} must be a non-empty string")
+    for field, kind in RECORD_FIELD_TYPES.items():
+        value = record.get(field)
+        if value is not None and (isinstance(value, bool) or not isinstance(value, kind)):
+            raise ValueError(f"{field} must be {TYPE_NAMES[kind]}")
+    if record.get("id") is not None and record["id"] < 1:
+        raise ValueError("id must be positive")
+    if not all(isinstance(source, dict) for source in record.get("sources") or []):
+        raise ValueError("sources must be objects")
+    if not all(isinstance(stat, (str, int, float)) and not isinstance(stat, bool) for stat in record.get("key_stats") or []):
+        raise ValueError("key_stats must be strings")
+
+async def read_ndjson(chunks):
+    """Parse NDJSON records from byte chunks, gunzipping if needed (concatenated gzip segments work too)
+
+    Raises ValueError naming the line of a malformed record.
+    """
+    decompressor = None
+    pending = b""
+    line_number = 0
+    first = True
+
+    async def parse(line: bytes):
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record must be an object")
+            check_record(record)
+            if record.get("image"):
+                image = record["image"]
+                if not isinstance(image, dict) or not all(isinstance(image.get(k) or "", str) for k in ("data", "path", "media_type")):
+                    raise ValueError("image must be an object with string data, path and media_type")
+                record["image"] = await _load_image(record["image"])
+        except ValueError as e:
+            raise ValueError(f"Line {line_number}: {e}") from e
+        return record
+
+    async for chunk in chunks:
+        if first and chunk:
+            first = False
+            if chunk.startswith(GZIP_MAGIC):
+                decompressor = zlib.decompressobj(wbits=31)
+        if decompressor:
+            data, chunk = [], chunk
+            while chunk:
+                data.append(decompressor.decompress(chunk))
+                if not decompressor.eof:
+                    break
+                chunk = decompressor.unused_data
+                decompressor = zlib.decompressobj(wbits=31)
+            chunk = b"".join(data)
+
+        lines = (pending + chunk).split(b"\n")
+        pending = lines.pop()
+        for line in lines:
+            line_number += 1
+            if line.strip():
+                yield await parse(line)
+
+    if pending.strip():
+        line_number += 1
+        yield await parse(pending)
+
+async def import_ndjson(chunks) -> dict:
+    """Bulk-import an NDJSON (or gzipped NDJSON) stream produced by export or by retention archiving"""
+    try:
+        result = await import_research(read_ndjson(chunks))
+    except zlib.error as e:
+        raise ValueError(f"Invalid gzip data: {e}") from e
+    stats["imports"] += 1
+    stats["rows_imported"] += result["inserted"]
+    stats["rows_skipped"] += result["skipped"]
+    stats["images_imported"] += result["images"]
+    print(f"Import: {result['inserted']} rows inserted, {result['skipped']} skipped, {result['images']} images")
+    return result
+
+def get_stats() -> dict:
+    """Export/import counters for the stats endpoint"""
+    return dict(stats)
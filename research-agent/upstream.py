@@ -0,0 +1,207 @@
+import os
+import math
+import time
+import random
+import asyncio
+import httpx
+from email.utils import parsedate_to_datetime
+
+# Per-provider limits. `rpm` feeds a token bucket (None = unlimited), `concurrency`
+# caps requests in flight. Defaults sit just under OpenAI tier-1 and Tavily quotas.
+# They are totals for the whole deployment: each of the UPSTREAM_PROCESSES worker
+# processes gets an equal share, since every process calls the same accounts.
+PROVIDERS = {
+    "openai": {
+        "rpm": float(os.environ.get("OPENAI_RPM", "450")),
+        "concurrency": int(os.environ.get("OPENAI_CONCURRENCY", "8")),
+    },
+    "openai_images": {
+        "rpm": float(os.environ.get("OPENAI_IMAGES_RPM", "5")),
+        "concurrency": int(os.environ.get("OPENAI_IMAGES_CONCURRENCY", "2")),
+    },
+    "tavily": {
+        "rpm": float(os.environ.get("TAVILY_RPM", "90")),
+        "concurrency": int(os.environ.get("TAVILY_CONCURRENCY", "4")),
+    },
+    "download": {
+        "rpm": None,
+        "concurrency": int(os.environ.get("DOWNLOAD_CONCURRENCY", "4")),
+    },
+}
+
+# Worker processes sharing the limits above; uvicorn reads WEB_CONCURRENCY as its --workers
+# default, so set it (rather than passing --workers) when running several processes
+UPSTREAM_PROCESSES = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+
+# Retries for 429, 5xx and connection errors: jittered exponential backoff, Retry-After wins
+UPSTREAM_MAX_RETRIES = int(os.environ.get("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = 1.0
+UPSTREAM_BACKOFF_MAX = 30.0
+RETRY_AFTER_MAX = 60.0
+
+# Circuit breaker: after N consecutive failed requests, reject calls for a while, then allow one trial
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_SECONDS = float(os.environ.get("CIRCUIT_RESET_SECONDS", "60"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """Raised when a provider's circuit breaker is rejecting calls"""
+
+# Shared HTTP client: keeps keep-alive connections to api.openai.com and api.tavily.com
+http_client = None
+_state = {}  # provider -> limiter/breaker state
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared HTTP client, creating it on first use"""
+    global http_client
+    if http_client is None:
+        http_client = httpx.AsyncClient(
+            timeout=60.0,
+            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20, keepalive_expiry=60.0)
+        )
+    return http_client
+
+async def close_http_client():
+    """Close the shared HTTP client (called once at shutdown)"""
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
+
+def _provider(name: str) -> dict:
+    state = _state.get(name)
+    if state is None:
+        config = PROVIDERS[name]
+        # This process's share of the deployment-wide limits
+        concurrency = max(1, math.ceil(config["concurrency"] / UPSTREAM_PROCESSES))
+        state = _state[name] = {
+            "rate": config["rpm"] / UPSTREAM_PROCESSES / 60.0 if config["rpm"] else None,
+            "burst": float(concurrency),
+            "tokens": float(concurrency),
+            "refilled_at": time.monotonic(),
+            "semaphore": asyncio.Semaphore(concurrency),
+            "limits": {"rpm": round(config["rpm"] / UPSTREAM_PROCESSES, 2) if config["rpm"] else None,
+                       "concurrency": concurrency},
+            "failures": 0,
+            "opened_at": None,
+            "trial": False,
+            "stats": {"requests": 0, "retries": 0, "throttled": 0, "failed": 0, "rejected": 0, "in_flight": 0},
+        }
+    return state
+
+async def _take_token(state: dict):
+    """Wait for a token from the provider's bucket"""
+    if state["rate"] is None:
+        return
+    while True:
+        now = time.monotonic()
+        state["tokens"] = min(state["burst"], state["tokens"] + (now - state["refilled_at"]) * state["rate"])
+        state["refilled_at"] = now
+        if state["tokens"] >= 1:
+            state["tokens"] -= 1
+            return
+        await asyncio.sleep((1 - state["tokens"]) / state["rate"])
+
+def _check_circuit(name: str, state: dict):
+    """Raise CircuitOpenError unless the provider may be called now"""
+    if state["opened_at"] is None:
+        return
+    if time.monotonic() - state["opened_at"] < CIRCUIT_RESET_SECONDS or state["trial"]:
+        state["stats"]["rejected"] += 1
+        raise CircuitOpenError(f"{name} circuit open after {state['failures']} consecutive failures")
+    state["trial"] = True  # Half-open: let this one request through
+
+def _record_result(name: str, state: dict, ok: bool):
+    state["trial"] = False
+    if ok:
+        state["failures"] = 0
+        state["opened_at"] = None
+        return
+    state["failures"] += 1
+    state["stats"]["failed"] += 1
+    if state["failures"] >= CIRCUIT_FAILURE_THRESHOLD:
+        if state["opened_at"] is None:
+            print(f"Circuit open for {name} ({state['failures']} consecutive failures)")
+        state["opened_at"] = time.monotonic()
+
+def retry_after_seconds(response: httpx.Response) -> float:
+    """Delay requested by a Retry-After header (seconds or HTTP date), or None"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for a retry attempt (0-based)"""
+    return random.uniform(0, min(UPSTREAM_BACKOFF_MAX, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+async def request(provider: str, method: str, url: str, **kwargs) -> httpx.Response:
+    """Send a request to an upstream provider within its rate, concurrency and circuit limits.
+
+    Retries 429/5xx responses and connection errors, then raises
+    (httpx.HTTPStatusError / httpx.TransportError). Other 4xx responses
+    raise immediately. Raises CircuitOpenError while the provider is failing.
+    """
+    state = _provider(provider)
+    stats = state["stats"]
+    _check_circuit(provider, state)
+
+    attempt = 0
+    while True:
+        delay = None
+        async with state["semaphore"]:
+            await _take_token(state)
+            stats["requests"] += 1
+            stats["in_flight"] += 1
+            try:
+                response = await get_http_client().request(method, url, **kwargs)
+            except httpx.TransportError:
+                if attempt >= UPSTREAM_MAX_RETRIES:
+                    _record_result(provider, state, ok=False)
+                    raise
+                response = None
+            except BaseException:
+                state["trial"] = False
+                raise
+            finally:
+                stats["in_flight"] -= 1
+
+        if response is not None:
+            if response.status_code not in RETRYABLE_STATUS:
+                # Client errors are the caller's problem, not a sign the provider is down
+                _record_result(provider, state, ok=response.status_code < 500)
+                response.raise_for_status()
+                return response
+            if response.status_code == 429:
+                stats["throttled"] += 1
+                state["tokens"] = 0.0  # Slow every caller down, not just this one
+            if attempt >= UPSTREAM_MAX_RETRIES:
+                _record_result(provider, state, ok=False)
+                response.raise_for_status()
+            delay = retry_after_seconds(response)
+
+        if delay is None:
+            delay = backoff_delay(attempt)
+        attempt += 1
+        stats["retries"] += 1
+        await asyncio.sleep(min(delay, RETRY_AFTER_MAX))
+
+def get_stats() -> dict:
+    """Per-provider request, retry and circuit counters for the stats endpoint"""
+    return {
+        name: {
+            **state["stats"],
+            "limits": state["limits"],
+            "circuit": "closed" if state["opened_at"] is None else ("half_open" if state["trial"] else "open"),
+            "consecutive_failures": state["failures"],
+        }
+        for name, state in _state.items()
+    }